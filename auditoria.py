@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from config import settings
+from database import engine, usa_memoria
+from repositorio_memoria import obtener_repositorio_memoria
+
+logger = logging.getLogger(__name__)
+
+# Tabla auditoria_cambios: solo inserciones (migraciones_sql/0001)
+COPY_AUDITORIA = """
+COPY auditoria_cambios
+(fecha, tabla, operacion, id_registro, id_usuario_compromiso_asignacion, id_usuario_actor, datos)
+FROM STDIN
+"""
+
+
+class RegistroAuditoria:
+    """Cola acotada de eventos de auditoría que se guardan por lotes con COPY.
+
+    Si la cola está llena, registrar() espera (contrapresión sobre las
+    escrituras) hasta espera_maxima; pasado ese tiempo el evento se descarta
+    con un error en el log para no dejar colgada la petición.
+    """
+
+    def __init__(
+        self,
+        tamano_cola: int,
+        tamano_lote: int,
+        intervalo: float = 1.0,
+        espera_maxima: float = 5.0,
+    ):
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=tamano_cola)
+        self._lote_en_curso: List[tuple] = []
+        self._tarea = None
+
+    async def iniciar(self):
+        self._tarea = asyncio.create_task(self._procesar())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        # Guardar el lote interrumpido y lo que quedó en la cola
+        pendientes = self._lote_en_curso
+        self._lote_en_curso = []
+        try:
+            while pendientes or not self._cola.empty():
+                pendientes = self._tomar_lote(pendientes)
+                await self._guardar(pendientes)
+                pendientes = []
+        except Exception:
+            # No cortar el resto del apagado (p. ej. cerrar el pool); lo que
+            # quedó sin guardar va al log
+            while not self._cola.empty():
+                pendientes.append(self._cola.get_nowait())
+            logger.exception(
+                "No se pudieron guardar %d eventos de auditoría al apagar: %s",
+                len(pendientes),
+                pendientes,
+            )
+
+    def _evento(
+        self,
+        tabla: str,
+        operacion: str,
+        id_asignacion: int,
+        id_registro: Optional[int] = None,
+        id_usuario_actor: Optional[int] = None,
+        datos: Optional[dict] = None,
+    ) -> tuple:
+        return (
+            datetime.now(),
+            tabla,
+            operacion,
+            id_registro,
+            id_asignacion,
+            id_usuario_actor,
+            json.dumps(datos or {}, default=str),
+        )
+
+    async def registrar(
+        self,
+        tabla: str,
+        operacion: str,
+        id_asignacion: int,
+        id_registro: Optional[int] = None,
+        id_usuario_actor: Optional[int] = None,
+        datos: Optional[dict] = None,
+    ):
+        evento = self._evento(
+            tabla, operacion, id_asignacion, id_registro, id_usuario_actor, datos
+        )
+        if usa_memoria():
+            # Backend en memoria: el evento queda en el repositorio del proceso
+            obtener_repositorio_memoria().registrar_auditoria(evento)
+            return
+        try:
+            await asyncio.wait_for(self._cola.put(evento), timeout=self.espera_maxima)
+        except asyncio.TimeoutError:
+            logger.error("Cola de auditoría llena; evento descartado: %s", evento)
+
+    def registrar_sin_espera(self, *args, **kwargs):
+        """Como registrar() (mismos argumentos), pero sin contrapresión: si la
+        cola está llena el evento se descarta con un error en el log.
+
+        Para quien no puede esperar (p. ej. mientras retiene un lock).
+        """
+        evento = self._evento(*args, **kwargs)
+        if usa_memoria():
+            obtener_repositorio_memoria().registrar_auditoria(evento)
+            return
+        try:
+            self._cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            logger.error("Cola de auditoría llena; evento descartado: %s", evento)
+
+    def _tomar_lote(self, lote: List[tuple]) -> List[tuple]:
+        while len(lote) < self.tamano_lote and not self._cola.empty():
+            lote.append(self._cola.get_nowait())
+        return lote
+
+    async def _guardar(self, lote: List[tuple]):
+        async with engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            async with raw.driver_connection.cursor() as cur:
+                async with cur.copy(COPY_AUDITORIA) as copy:
+                    for evento in lote:
+                        await copy.write_row(evento)
+
+    async def _procesar(self):
+        while True:
+            primero = await self._cola.get()
+            self._lote_en_curso = self._tomar_lote([primero])
+
+            # Reintentar el mismo lote hasta poder guardarlo; mientras tanto la
+            # cola se llena y las escrituras empiezan a esperar
+            while True:
+                try:
+                    await self._guardar(self._lote_en_curso)
+                    self._lote_en_curso = []
+                    break
+                except Exception:
+                    logger.exception("No se pudo guardar la auditoría; reintentando")
+                    await asyncio.sleep(self.intervalo)
+
+
+registro_auditoria = RegistroAuditoria(
+    settings.auditoria_tamano_cola, settings.auditoria_tamano_lote
+)
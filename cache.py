@@ -0,0 +1,30 @@
+import time
+from typing import Any, Hashable, Optional
+
+
+class CacheTTL:
+    """Cache en memoria con expiración por tiempo (por proceso)"""
+
+    def __init__(self, ttl_segundos: float):
+        self.ttl_segundos = ttl_segundos
+        self._datos: dict = {}
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        expira, valor = entrada
+        if expira < time.monotonic():
+            self._datos.pop(clave, None)
+            return None
+        return valor
+
+    def guardar(self, clave: Hashable, valor: Any):
+        ahora = time.monotonic()
+        # Purgar vencidos para que el cache no crezca sin límite
+        for k in [k for k, (expira, _) in self._datos.items() if expira < ahora]:
+            del self._datos[k]
+        self._datos[clave] = (ahora + self.ttl_segundos, valor)
+
+    def limpiar(self):
+        self._datos.clear()
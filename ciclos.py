@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ============================================
+# CICLOS DE EVALUACIÓN
+# ============================================
+# preparacion -> abierto -> cerrado (tabla ciclos_evaluacion, migraciones_sql/0004).
+# La API lee solo el ciclo abierto; abrir el siguiente cierra el anterior.
+# Ninguna función hace commit: la transacción la controla quien llama.
+
+QUERY_CICLOS = """
+SELECT ciclo, estado, fecha_apertura, fecha_cierre
+FROM ciclos_evaluacion
+ORDER BY ciclo
+"""
+
+
+class ErrorCiclo(Exception):
+    """Operación no permitida sobre un ciclo"""
+
+
+async def listar_ciclos(db: AsyncSession) -> List[dict]:
+    result = await db.execute(text(QUERY_CICLOS))
+    return [
+        {"ciclo": row[0], "estado": row[1], "fecha_apertura": row[2], "fecha_cierre": row[3]}
+        for row in result
+    ]
+
+
+async def ciclo_abierto(db: AsyncSession) -> Optional[int]:
+    return (await db.execute(text("SELECT ciclo_actual()"))).scalar()
+
+
+async def _estado(db: AsyncSession, ciclo: int) -> Optional[str]:
+    result = await db.execute(
+        text("SELECT estado FROM ciclos_evaluacion WHERE ciclo = :ciclo"), {"ciclo": ciclo}
+    )
+    return result.scalar()
+
+
+async def preparar_ciclo(db: AsyncSession, ciclo: int) -> str:
+    """Registrar un ciclo futuro para cargarle asignaciones antes de abrirlo"""
+    estado = await _estado(db, ciclo)
+    if estado == "cerrado":
+        raise ErrorCiclo(f"El ciclo {ciclo} está cerrado")
+    if estado is not None:
+        return estado
+
+    abierto = await ciclo_abierto(db)
+    if abierto is not None and ciclo < abierto:
+        raise ErrorCiclo(f"El ciclo {ciclo} es anterior al abierto ({abierto})")
+    await db.execute(
+        text(
+            "INSERT INTO ciclos_evaluacion (ciclo, estado) VALUES (:ciclo, 'preparacion') "
+            "ON CONFLICT (ciclo) DO NOTHING"
+        ),
+        {"ciclo": ciclo},
+    )
+
+    # Con el particionado opcional (migraciones_sql/opcionales) el ciclo necesita sus particiones
+    particionado = await db.execute(text("SELECT to_regproc('crear_particiones_ciclo')"))
+    if particionado.scalar() is not None:
+        await db.execute(text("SELECT crear_particiones_ciclo(:ciclo)"), {"ciclo": ciclo})
+    return "preparacion"
+
+
+async def ciclo_destino_importacion(db: AsyncSession, ciclo: Optional[int]) -> int:
+    """Ciclo en el que se guarda una importación: el abierto o uno en preparación"""
+    if ciclo is None:
+        abierto = await ciclo_abierto(db)
+        if abierto is None:
+            raise ErrorCiclo("No hay un ciclo abierto")
+        return abierto
+    await preparar_ciclo(db, ciclo)
+    return ciclo
+
+
+async def abrir_ciclo(db: AsyncSession, ciclo: int) -> dict:
+    """Abrir un ciclo posterior al actual; el abierto pasa a cerrado"""
+    # Serializa aperturas concurrentes
+    await db.execute(text("LOCK TABLE ciclos_evaluacion IN SHARE ROW EXCLUSIVE MODE"))
+    abierto = await ciclo_abierto(db)
+    if abierto is not None and ciclo <= abierto:
+        raise ErrorCiclo(f"El ciclo {ciclo} no es posterior al abierto ({abierto})")
+
+    await preparar_ciclo(db, ciclo)
+    await db.execute(
+        text("""
+        UPDATE ciclos_evaluacion SET estado = 'cerrado', fecha_cierre = CURRENT_TIMESTAMP
+        WHERE estado = 'abierto'
+        """)
+    )
+    await db.execute(
+        text("""
+        UPDATE ciclos_evaluacion SET estado = 'abierto', fecha_apertura = CURRENT_TIMESTAMP
+        WHERE ciclo = :ciclo
+        """),
+        {"ciclo": ciclo},
+    )
+    return next(c for c in await listar_ciclos(db) if c["ciclo"] == ciclo)
+
+
+# ============================================
+# CLI
+# ============================================
+
+
+async def _main(abrir: Optional[int], preparar: Optional[int]):
+    from database import async_session, engine
+
+    try:
+        async with async_session() as db:
+            try:
+                if preparar is not None:
+                    await preparar_ciclo(db, preparar)
+                if abrir is not None:
+                    await abrir_ciclo(db, abrir)
+                await db.commit()
+            except ErrorCiclo as e:
+                print(f"Error: {e}")
+                return
+            ciclos = await listar_ciclos(db)
+    finally:
+        await engine.dispose()
+
+    for c in ciclos:
+        print(f"{c['ciclo']}: {c['estado']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ciclos de evaluación")
+    parser.add_argument(
+        "--preparar", type=int, help="Registrar un ciclo futuro para importarle asignaciones"
+    )
+    parser.add_argument(
+        "--abrir", type=int, help="Abrir el ciclo indicado y cerrar el abierto"
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.abrir, args.preparar))
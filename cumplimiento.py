@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from config import settings
+from validacion import JOIN_SUMAS_POR_ASIGNACION, calcular_peso_real, es_suma_valida
+
+# Los resultados van a validacion_pesos_resultado (migraciones_sql/0001)
+
+QUERY_ASIGNACIONES = f"""
+SELECT
+    uca.id, uca.id_usuario, uca.id_rol, uca.id_compromiso, c.peso_porcentual,
+    COALESCE(s.total, 0) + COALESCE(i.total, 0) AS total_acciones,
+    COALESCE(s.suma, 0) + COALESCE(i.suma, 0) AS suma_pesos
+FROM usuario_compromiso_asignacion uca
+JOIN compromisos c ON uca.id_compromiso = c.id
+{JOIN_SUMAS_POR_ASIGNACION}
+WHERE uca.estado = TRUE AND uca.ciclo = (SELECT ciclo_actual())
+"""
+
+UPSERT_RESULTADOS = """
+INSERT INTO validacion_pesos_resultado
+(id_usuario_compromiso_asignacion, id_usuario, id_rol, id_compromiso, total_acciones,
+ suma_pesos, peso_real_en_total, es_valido, fecha_calculo)
+VALUES (:id_asignacion, :id_usuario, :id_rol, :id_compromiso, :total_acciones,
+        :suma_pesos, :peso_real, :es_valido, :fecha_calculo)
+ON CONFLICT (id_usuario_compromiso_asignacion) DO UPDATE SET
+    id_usuario = EXCLUDED.id_usuario,
+    id_rol = EXCLUDED.id_rol,
+    id_compromiso = EXCLUDED.id_compromiso,
+    total_acciones = EXCLUDED.total_acciones,
+    suma_pesos = EXCLUDED.suma_pesos,
+    peso_real_en_total = EXCLUDED.peso_real_en_total,
+    es_valido = EXCLUDED.es_valido,
+    fecha_calculo = EXCLUDED.fecha_calculo
+"""
+
+# Asignaciones que ya no están activas no deben quedar en el reporte
+BORRAR_OBSOLETOS = """
+DELETE FROM validacion_pesos_resultado WHERE fecha_calculo < :fecha_calculo
+"""
+
+
+# ============================================
+# CÁLCULO POR LOTES (en procesos del pool)
+# ============================================
+
+
+def calcular_lote(filas: List[Tuple], tolerancia: float, fecha_calculo) -> List[dict]:
+    """Calcular validez y peso real de un lote de asignaciones"""
+    resultados = []
+    for id_asignacion, id_usuario, id_rol, id_compromiso, peso, total, suma in filas:
+        suma_pesos = float(suma)
+        resultados.append(
+            {
+                "id_asignacion": id_asignacion,
+                "id_usuario": id_usuario,
+                "id_rol": id_rol,
+                "id_compromiso": id_compromiso,
+                "total_acciones": int(total),
+                "suma_pesos": suma_pesos,
+                "peso_real": calcular_peso_real(suma_pesos, float(peso)),
+                "es_valido": es_suma_valida(suma_pesos, tolerancia),
+                "fecha_calculo": fecha_calculo,
+            }
+        )
+    return resultados
+
+
+# ============================================
+# BARRIDO
+# ============================================
+
+
+async def _guardar(engine, tareas) -> int:
+    total = 0
+    async with engine.begin() as conn:
+        for tarea in tareas:
+            resultados = tarea.result()
+            if resultados:
+                await conn.execute(text(UPSERT_RESULTADOS), resultados)
+                total += len(resultados)
+    return total
+
+
+async def ejecutar_barrido(workers: int, tamano_lote: int) -> int:
+    """Recalcular la validación de pesos de todas las asignaciones activas"""
+    from database import engine
+
+    loop = asyncio.get_running_loop()
+    fecha_calculo = datetime.now()
+    procesadas = 0
+    pendientes = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async with engine.connect() as lectura:
+            # stream() usa un cursor del lado del servidor
+            result = await lectura.stream(
+                text(QUERY_ASIGNACIONES), execution_options={"yield_per": tamano_lote}
+            )
+            async for lote in result.partitions(tamano_lote):
+                filas = [tuple(row) for row in lote]
+                pendientes.add(
+                    loop.run_in_executor(
+                        pool, calcular_lote, filas, settings.tolerancia_pesos, fecha_calculo
+                    )
+                )
+                # Limitar lotes en vuelo para acotar la memoria
+                if len(pendientes) >= workers * 2:
+                    hechas, pendientes = await asyncio.wait(
+                        pendientes, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    procesadas += await _guardar(engine, hechas)
+
+        if pendientes:
+            hechas, _ = await asyncio.wait(pendientes)
+            procesadas += await _guardar(engine, hechas)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(BORRAR_OBSOLETOS), {"fecha_calculo": fecha_calculo})
+
+    return procesadas
+
+
+async def _main(workers: int, tamano_lote: int):
+    from database import engine
+
+    inicio = time.monotonic()
+    try:
+        procesadas = await ejecutar_barrido(workers, tamano_lote)
+    finally:
+        await engine.dispose()
+    print(f"Asignaciones validadas: {procesadas} en {time.monotonic() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Barrido nocturno de validación de pesos de todas las asignaciones"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lote", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(_main(args.workers, args.lote))
@@ -1,12 +1,143 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import psycopg
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from config import settings
+from repositorio_memoria import obtener_repositorio_memoria
+from repositorio_postgres import RepositorioPostgres
+
+logger = logging.getLogger(__name__)
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+engine = create_async_engine(
+    settings.database_url,
+    echo=False,
+    future=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True,
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Tablas de catálogo que leen casi todas las peticiones
+CATALOGOS = ["compromisos", "roles", "acciones", "regionales", "centros"]
+
 async def get_db():
     async with async_session() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+async def _vigilar_desconexion(request: Request, conexion: psycopg.AsyncConnection):
+    while not await request.is_disconnected():
+        await asyncio.sleep(settings.intervalo_desconexion)
+    # cancel() abre una conexión aparte para el pedido de cancelación (bloqueante)
+    await asyncio.to_thread(conexion.cancel)
+
+
+async def get_db_cancelable(request: Request):
+    """Sesión que cancela la consulta en curso si el cliente se desconecta.
+
+    Solo para endpoints sin cuerpo (GET): vigilar la desconexión consume los
+    mensajes de la petición.
+    """
+    async with async_session() as session:
+        # Tomar la conexión ya para poder cancelar sobre ella
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        vigilante = asyncio.create_task(
+            _vigilar_desconexion(request, raw.driver_connection)
+        )
+        try:
+            yield session
+        except DBAPIError as e:
+            if isinstance(e.orig, psycopg.errors.QueryCanceled) and vigilante.done():
+                raise HTTPException(status_code=499, detail="Cliente desconectado")
+            raise
+        finally:
+            vigilante.cancel()
+            await asyncio.gather(vigilante, return_exceptions=True)
+            # close() hace rollback y devuelve la conexión al pool
+            await session.close()
+
+
+def usa_memoria() -> bool:
+    """Backend en memoria: la API funciona sin Postgres (pruebas de carga)"""
+    return settings.backend_datos == "memoria"
+
+
+@asynccontextmanager
+async def abrir_repositorio():
+    """Repositorio fuera de una petición (tareas en segundo plano)"""
+    if usa_memoria():
+        yield obtener_repositorio_memoria()
+        return
+    async with async_session() as session:
+        yield RepositorioPostgres(session)
+
+
+async def get_repositorio():
+    async with abrir_repositorio() as repo:
+        yield repo
+
+
+async def get_repositorio_cancelable(request: Request):
+    """Como get_repositorio, pero en Postgres cancela la consulta si el cliente se va"""
+    if usa_memoria():
+        yield obtener_repositorio_memoria()
+        return
+    # Como context manager, para que las excepciones lleguen a get_db_cancelable
+    async with asynccontextmanager(get_db_cancelable)(request) as session:
+        yield RepositorioPostgres(session)
+
+
+async def precalentar_pool(conexiones: int = settings.db_pool_size):
+    """Abrir las conexiones del pool por adelantado y recorrer los catálogos.
+
+    Los catálogos no se guardan en el proceso (las consultas los unen en SQL):
+    recorrerlos solo deja sus páginas en el cache de Postgres.
+    """
+
+    async def abrir():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    resultados = await asyncio.gather(
+        *(abrir() for _ in range(conexiones)), return_exceptions=True
+    )
+    conns = [r for r in resultados if not isinstance(r, BaseException)]
+    try:
+        errores = [r for r in resultados if isinstance(r, BaseException)]
+        if errores:
+            raise errores[0]
+        # Lee todas las páginas sin traer las filas al proceso
+        for tabla in CATALOGOS:
+            await conns[0].execute(text(f"SELECT count(*) FROM {tabla}"))
+    finally:
+        # Al cerrarlas vuelven al pool, ya establecidas
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+
+async def verificar_conexion() -> bool:
+    """Comprobar que la base de datos responde"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        logger.exception("La base de datos no responde")
+        return False
+
+
+def abrir_repositorio_cancelable(request: Request):
+    """get_repositorio_cancelable como context manager, para tomar la sesión
+    dentro del handler (p. ej. solo si el cache no tenía la respuesta)"""
+    return asynccontextmanager(get_repositorio_cancelable)(request)
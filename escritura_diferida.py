@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from auditoria import registro_auditoria
+from config import settings
+from database import abrir_repositorio
+
+logger = logging.getLogger(__name__)
+
+
+class BufferSelecciones:
+    """Agrupa selecciones repetidas de la misma acción y las guarda por lotes.
+
+    Dentro de la ventana solo se conserva el último peso de cada
+    (asignación, acción). Lo pendiente se guarda al apagar la API; si el
+    proceso muere sin apagarse se pierde como máximo una ventana de cambios.
+    """
+
+    def __init__(self, ventana_segundos: float):
+        self.ventana_segundos = ventana_segundos
+        # (id_asignacion, id_accion) -> (peso, usuario_id, id_rol, id_usuario_actor)
+        self._pendientes: Dict[Tuple[int, int], Tuple[float, int, int, Optional[int]]] = {}
+        self._lock = asyncio.Lock()
+        self._tarea = None
+
+    async def iniciar(self):
+        self._tarea = asyncio.create_task(self._vaciar_periodicamente())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        try:
+            await self.vaciar()
+        except Exception:
+            # No cortar el resto del apagado; lo que quedó sin guardar va al log
+            logger.exception(
+                "No se pudieron guardar %d selecciones pendientes al apagar: %s",
+                len(self._pendientes),
+                self._pendientes,
+            )
+
+    def agregar(
+        self,
+        id_asignacion: int,
+        id_accion: int,
+        peso: float,
+        usuario_id: int,
+        id_rol: int,
+        id_usuario_actor: Optional[int] = None,
+    ):
+        self._pendientes[(id_asignacion, id_accion)] = (
+            peso,
+            usuario_id,
+            id_rol,
+            id_usuario_actor,
+        )
+
+    async def vaciar(self, usuario_id: Optional[int] = None, id_rol: Optional[int] = None):
+        """Guardar lo pendiente (todo, o solo lo de un usuario y rol)"""
+        async with self._lock:
+            claves = [
+                clave
+                for clave, (_, u, r, _) in self._pendientes.items()
+                if usuario_id is None or (u == usuario_id and r == id_rol)
+            ]
+            if not claves:
+                return
+            lote = {clave: self._pendientes.pop(clave) for clave in claves}
+
+            try:
+                await self._guardar(lote)
+                guardados = lote
+            except Exception:
+                # Una fila inválida hace fallar todo el lote: reintentar de a una
+                logger.warning("Falló el lote de %d selecciones; reintentando por fila", len(lote))
+                guardados, error = await self._guardar_por_fila(lote)
+            except BaseException:
+                self._devolver(lote)
+                raise
+            else:
+                error = None
+
+        # La auditoría va fuera del lock: con la cola llena no debe frenar
+        # los vaciados de las peticiones
+        for (id_asignacion, id_accion), (peso, _, _, actor) in guardados.items():
+            registro_auditoria.registrar_sin_espera(
+                "usuario_compromiso_accion_seleccion",
+                "UPSERT",
+                id_asignacion,
+                id_usuario_actor=actor,
+                datos={"id_accion": id_accion, "peso_porcentual_usuario": peso},
+            )
+        if error is not None:
+            raise error
+
+    async def _guardar(self, lote: dict):
+        async with abrir_repositorio() as repo:
+            await repo.guardar_selecciones(
+                [(a, acc, peso) for (a, acc), (peso, _, _, _) in lote.items()]
+            )
+            for u, r in {(u, r) for _, u, r, _ in lote.values()}:
+                await repo.notificar_cambio_pesos(u, r)
+            await repo.confirmar()
+
+    async def _guardar_por_fila(
+        self, lote: dict
+    ) -> Tuple[dict, Optional[BaseException]]:
+        """Guardar cada fila en su transacción; descartar las que la base rechaza.
+
+        Las filas rechazadas (restricciones o datos inválidos) quedan en el log
+        de errores con todos sus datos. Ante otro error (p. ej. sin conexión)
+        se devuelve al buffer lo que falta y se entrega el error junto con lo
+        ya guardado, para auditarlo antes de propagarlo.
+        """
+        guardados = {}
+        claves = list(lote)
+        for i, clave in enumerate(claves):
+            fila = {clave: lote[clave]}
+            try:
+                await self._guardar(fila)
+            except (IntegrityError, DataError):
+                id_asignacion, id_accion = clave
+                peso, u, r, actor = lote[clave]
+                logger.exception(
+                    "Selección descartada: asignacion=%s accion=%s peso=%s usuario=%s "
+                    "rol=%s actor=%s",
+                    id_asignacion, id_accion, peso, u, r, actor,
+                )
+                continue
+            except BaseException as e:
+                self._devolver({c: lote[c] for c in claves[i:]})
+                return guardados, e
+            guardados.update(fila)
+        return guardados, None
+
+    def _devolver(self, lote: dict):
+        # Devolver al buffer lo que no fue reemplazado por una escritura más nueva
+        for clave, valor in lote.items():
+            self._pendientes.setdefault(clave, valor)
+
+    async def _vaciar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.ventana_segundos)
+            try:
+                await self.vaciar()
+            except Exception:
+                logger.exception("No se pudieron guardar las selecciones pendientes")
+
+
+buffer_selecciones = BufferSelecciones(settings.escritura_diferida_ventana)
@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from config import settings
+from schemas import (
+    AccionResumenResponse,
+    CompromisoResumenResponse,
+    UsuarioResumenResponse,
+)
+from validacion import es_suma_valida
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional: uv sync --extra historico
+    pa = pq = None
+
+# ============================================
+# ARCHIVO POR CICLO
+# ============================================
+# Un Parquet por ciclo cerrado con una fila por acción (o una sola fila sin
+# acción si el compromiso no tiene ninguna), ordenado por usuario para que
+# la lectura de un usuario solo toque sus grupos de filas.
+
+COLUMNAS = [
+    ("id_usuario", "int64"),
+    ("email", "string"),
+    ("rol", "string"),
+    ("regional", "string"),
+    ("centro", "string"),
+    ("id_asignacion", "int64"),
+    ("asignacion_activa", "bool"),
+    ("id_rol", "int64"),
+    ("id_compromiso", "int64"),
+    ("compromiso", "string"),
+    ("peso_compromiso", "float64"),
+    ("id_accion", "int64"),
+    ("accion", "string"),
+    ("peso_accion", "float64"),
+]
+
+# Mismo usuario/rol/regional/centro que el resumen en línea (repositorio_postgres)
+QUERY_CICLO = """
+SELECT
+    u.id, u.email, ur.rol, ur.regional, ur.centro,
+    uca.id, uca.estado, uca.id_rol, c.id, c.nombre, c.peso_porcentual::float8,
+    acc.id, acc.nombre, acc.peso::float8
+FROM usuario_compromiso_asignacion uca
+JOIN usuarios u ON uca.id_usuario = u.id
+JOIN compromisos c ON uca.id_compromiso = c.id
+LEFT JOIN LATERAL (
+    SELECT r.nombre AS rol, reg.nombre_regional AS regional, ce.nombre_centro AS centro
+    FROM usuarios u2
+    LEFT JOIN usuario_rol_regional urr ON u2.id = urr.id_usuario
+    LEFT JOIN usuario_rol_centro urc ON u2.id = urc.id_usuario
+    LEFT JOIN roles r ON urr.id_rol = r.id OR urc.id_rol = r.id
+    LEFT JOIN regionales reg ON urr.id_regional = reg.id
+    LEFT JOIN centros ce ON urc.id_centro = ce.id
+    WHERE u2.id = u.id
+    ORDER BY r.id, reg.id, ce.id
+    LIMIT 1
+) ur ON TRUE
+LEFT JOIN LATERAL (
+    SELECT ucas.id, a.nombre, ucas.peso_porcentual_usuario AS peso
+    FROM usuario_compromiso_accion_seleccion ucas
+    JOIN acciones a ON ucas.id_accion = a.id
+    WHERE ucas.id_usuario_compromiso_asignacion = uca.id
+
+    UNION ALL
+
+    SELECT uai.id, uai.nombre, uai.peso_porcentual_usuario
+    FROM usuario_accion_innovacion uai
+    WHERE uai.id_usuario_compromiso_asignacion = uca.id
+) acc ON TRUE
+WHERE uca.ciclo = :ciclo
+ORDER BY u.id, c.id, uca.id, acc.id
+"""
+
+# Un evento por asignación antes de borrar: el historial de cada una termina
+# indicando en qué archivo quedaron sus datos
+AUDITAR_ARCHIVO = """
+INSERT INTO auditoria_cambios
+(fecha, tabla, operacion, id_registro, id_usuario_compromiso_asignacion, id_usuario_actor, datos)
+SELECT
+    CURRENT_TIMESTAMP, 'usuario_compromiso_asignacion', 'ARCHIVE', uca.id, uca.id, NULL,
+    jsonb_build_object(
+        'ciclo', uca.ciclo,
+        'archivo', CAST(:archivo AS TEXT),
+        'selecciones', (
+            SELECT COUNT(*) FROM usuario_compromiso_accion_seleccion ucas
+            WHERE ucas.id_usuario_compromiso_asignacion = uca.id
+        ),
+        'innovaciones', (
+            SELECT COUNT(*) FROM usuario_accion_innovacion uai
+            WHERE uai.id_usuario_compromiso_asignacion = uca.id
+        )
+    )
+FROM usuario_compromiso_asignacion uca
+WHERE uca.ciclo = :ciclo
+"""
+
+# Hijas primero; la auditoría se conserva (registro histórico de solo inserción)
+BORRAR_CICLO = [
+    (
+        "validacion_pesos_resultado",
+        """
+        DELETE FROM validacion_pesos_resultado v
+        USING usuario_compromiso_asignacion uca
+        WHERE v.id_usuario_compromiso_asignacion = uca.id AND uca.ciclo = :ciclo
+        """,
+    ),
+    (
+        "usuario_compromiso_accion_seleccion",
+        """
+        DELETE FROM usuario_compromiso_accion_seleccion ucas
+        USING usuario_compromiso_asignacion uca
+        WHERE ucas.id_usuario_compromiso_asignacion = uca.id AND uca.ciclo = :ciclo
+        """,
+    ),
+    (
+        "usuario_accion_innovacion",
+        """
+        DELETE FROM usuario_accion_innovacion uai
+        USING usuario_compromiso_asignacion uca
+        WHERE uai.id_usuario_compromiso_asignacion = uca.id AND uca.ciclo = :ciclo
+        """,
+    ),
+    (
+        "usuario_compromiso_asignacion",
+        "DELETE FROM usuario_compromiso_asignacion WHERE ciclo = :ciclo",
+    ),
+]
+
+
+class ErrorHistorico(Exception):
+    """No se puede archivar o leer el histórico"""
+
+
+def _requerir_pyarrow():
+    if pq is None:
+        raise ErrorHistorico("Falta pyarrow (instalar con: uv sync --extra historico)")
+
+
+def _esquema():
+    return pa.schema([(nombre, tipo) for nombre, tipo in COLUMNAS])
+
+
+def ruta_ciclo(ciclo: int) -> Path:
+    return Path(settings.historico_directorio) / f"ciclo_{ciclo}.parquet"
+
+
+def ciclos_archivados() -> List[int]:
+    directorio = Path(settings.historico_directorio)
+    if not directorio.is_dir():
+        return []
+    # Se ignoran otros archivos que coincidan con el patrón (p. ej. ciclo_viejo.parquet)
+    numeros = (ruta.stem.removeprefix("ciclo_") for ruta in directorio.glob("ciclo_*.parquet"))
+    return sorted(int(n) for n in numeros if n.isascii() and n.isdigit())
+
+
+# ============================================
+# CONGELAR
+# ============================================
+
+
+async def congelar_ciclo(
+    ciclo: int, reemplazar: bool = False, tamano_lote: int = 10000
+) -> dict:
+    """Archivar un ciclo cerrado en Parquet y quitarlo de las tablas operativas.
+
+    Lectura y borrado van en una transacción REPEATABLE READ, así que se
+    borra exactamente lo que se archivó. El archivo toma su nombre final
+    recién después de borrar; si luego falla el commit, los datos siguen en
+    las tablas y se puede repetir con reemplazar=True.
+    """
+    from database import engine
+
+    _requerir_pyarrow()
+    destino = ruta_ciclo(ciclo)
+    if destino.exists() and not reemplazar:
+        raise ErrorHistorico(f"El ciclo {ciclo} ya está archivado en {destino}")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_suffix(".parquet.tmp")
+
+    esquema = _esquema()
+    filas = 0
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+        async with conn.begin():
+            estado = (
+                await conn.execute(
+                    text("SELECT estado FROM ciclos_evaluacion WHERE ciclo = :ciclo"),
+                    {"ciclo": ciclo},
+                )
+            ).scalar()
+            if estado != "cerrado":
+                raise ErrorHistorico(
+                    f"El ciclo {ciclo} no está cerrado (estado: {estado or 'no registrado'})"
+                )
+
+            try:
+                # stream() usa un cursor del lado del servidor
+                result = await conn.stream(
+                    text(QUERY_CICLO),
+                    {"ciclo": ciclo},
+                    execution_options={"yield_per": tamano_lote},
+                )
+                with pq.ParquetWriter(temporal, esquema, compression="zstd") as escritor:
+                    async for lote in result.partitions(tamano_lote):
+                        # Un grupo de filas por lote (con estadísticas de id_usuario)
+                        arreglos = [
+                            pa.array(valores, tipo)
+                            for valores, (_, tipo) in zip(zip(*lote), COLUMNAS)
+                        ]
+                        escritor.write_table(pa.Table.from_arrays(arreglos, schema=esquema))
+                        filas += len(lote)
+
+                if not filas:
+                    raise ErrorHistorico(f"No hay datos del ciclo {ciclo}")
+
+                result = await conn.execute(
+                    text(AUDITAR_ARCHIVO), {"ciclo": ciclo, "archivo": str(destino)}
+                )
+                auditadas = result.rowcount
+
+                borradas = {}
+                for tabla, query in BORRAR_CICLO:
+                    result = await conn.execute(text(query), {"ciclo": ciclo})
+                    borradas[tabla] = result.rowcount
+
+                os.replace(temporal, destino)
+            finally:
+                temporal.unlink(missing_ok=True)
+
+    return {
+        "ciclo": ciclo,
+        "archivo": str(destino),
+        "filas": filas,
+        "borradas": borradas,
+        "auditadas": auditadas,
+    }
+
+
+# ============================================
+# LECTURA
+# ============================================
+
+
+def leer_resumen_usuario(ciclo: int, usuario_id: int) -> Optional[UsuarioResumenResponse]:
+    """Resumen de un usuario en un ciclo archivado (None si no tenía asignaciones).
+
+    Lectura con memory map y filtro por usuario: solo se leen los grupos de
+    filas cuyas estadísticas incluyen al usuario. Es bloqueante (usar en un hilo).
+    """
+    _requerir_pyarrow()
+    filas = pq.read_table(
+        ruta_ciclo(ciclo), memory_map=True, filters=[("id_usuario", "=", usuario_id)]
+    ).to_pylist()
+    if not filas:
+        return None
+
+    # Igual que el resumen en línea: compromisos de asignaciones activas,
+    # acciones de todas las asignaciones del compromiso
+    compromisos = []
+    for compromiso_id in sorted({f["id_compromiso"] for f in filas if f["asignacion_activa"]}):
+        del_compromiso = [f for f in filas if f["id_compromiso"] == compromiso_id]
+        suma_pesos = sum(
+            f["peso_accion"]
+            for f in del_compromiso
+            if f["asignacion_activa"] and f["id_accion"] is not None
+        )
+        compromisos.append(
+            CompromisoResumenResponse(
+                id=compromiso_id,
+                nombre=del_compromiso[0]["compromiso"],
+                peso_porcentual=del_compromiso[0]["peso_compromiso"],
+                acciones_seleccionadas=[
+                    AccionResumenResponse(
+                        id=f["id_accion"],
+                        nombre=f["accion"],
+                        peso_porcentual_usuario=f["peso_accion"],
+                    )
+                    for f in del_compromiso
+                    if f["id_accion"] is not None
+                ],
+                suma_pesos=suma_pesos,
+                estado_completo=es_suma_valida(suma_pesos),
+            )
+        )
+
+    usuario = filas[0]
+    return UsuarioResumenResponse(
+        id=usuario["id_usuario"],
+        nombre=usuario["email"],
+        email=usuario["email"],
+        rol=usuario["rol"] or "Sin rol",
+        regional=usuario["regional"],
+        centro=usuario["centro"],
+        compromisos=compromisos,
+    )
+
+
+# ============================================
+# CLI
+# ============================================
+
+
+async def _main(ciclo: int, reemplazar: bool):
+    from database import engine
+
+    try:
+        resultado = await congelar_ciclo(ciclo, reemplazar)
+    except ErrorHistorico as e:
+        print(f"Error: {e}")
+        return
+    finally:
+        await engine.dispose()
+
+    print(
+        f"Ciclo {resultado['ciclo']} archivado en {resultado['archivo']} "
+        f"({resultado['filas']} filas)"
+    )
+    for tabla, cantidad in resultado["borradas"].items():
+        print(f"  {tabla}: {cantidad} filas borradas")
+    print(f"  auditoria_cambios: {resultado['auditadas']} eventos de archivo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Archivar un ciclo cerrado en Parquet y quitarlo de las tablas operativas"
+    )
+    parser.add_argument("--ciclo", type=int, required=True)
+    parser.add_argument(
+        "--reemplazar", action="store_true", help="Sobrescribir el archivo si ya existe"
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.ciclo, args.reemplazar))
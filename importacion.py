@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import sys
+from typing import AsyncIterator, Optional
+
+import psycopg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ciclos import ErrorCiclo, ciclo_destino_importacion
+from config import settings
+
+# ============================================
+# STAGING
+# ============================================
+
+CREAR_STAGING = """
+CREATE TEMP TABLE staging_asignaciones (
+    fila BIGSERIAL,
+    id_usuario TEXT,
+    id_rol TEXT,
+    id_regional TEXT,
+    id_centro TEXT,
+    id_compromiso TEXT
+) ON COMMIT DROP;
+
+CREATE TEMP TABLE staging_errores (
+    fila BIGINT NOT NULL,
+    error TEXT NOT NULL
+) ON COMMIT DROP;
+"""
+
+# La cabecera se valida en Python (_leer_cabecera): HEADER true de COPY la
+# descarta sin mirarla, y HEADER MATCH requiere Postgres 15
+CABECERA = "id_usuario,id_rol,id_regional,id_centro,id_compromiso"
+MAX_BYTES_CABECERA = 4096
+
+COPY_STAGING = """
+COPY staging_asignaciones (id_usuario, id_rol, id_regional, id_centro, id_compromiso)
+FROM STDIN WITH (FORMAT csv)
+"""
+
+# ============================================
+# VALIDACIÓN (por conjuntos)
+# ============================================
+
+# Hasta 18 dígitos: cualquier valor que pase cabe en bigint, así que el
+# casteo de CREAR_STAGING_TIPADO no puede fallar por desborde
+VALIDAR_FORMATO = """
+INSERT INTO staging_errores (fila, error)
+SELECT fila, 'Valores no numéricos, demasiado largos o faltantes'
+FROM staging_asignaciones
+WHERE COALESCE(trim(id_usuario), '') !~ '^[0-9]{1,18}$'
+   OR COALESCE(trim(id_rol), '') !~ '^[0-9]{1,18}$'
+   OR COALESCE(trim(id_compromiso), '') !~ '^[0-9]{1,18}$'
+   OR COALESCE(trim(id_regional), '0') !~ '^[0-9]{0,18}$'
+   OR COALESCE(trim(id_centro), '0') !~ '^[0-9]{0,18}$'
+"""
+
+CREAR_STAGING_TIPADO = """
+CREATE TEMP TABLE staging_tipado ON COMMIT DROP AS
+SELECT
+    s.fila,
+    trim(s.id_usuario)::bigint AS id_usuario,
+    trim(s.id_rol)::bigint AS id_rol,
+    NULLIF(trim(s.id_regional), '')::bigint AS id_regional,
+    NULLIF(trim(s.id_centro), '')::bigint AS id_centro,
+    trim(s.id_compromiso)::bigint AS id_compromiso
+FROM staging_asignaciones s
+WHERE NOT EXISTS (SELECT 1 FROM staging_errores e WHERE e.fila = s.fila)
+"""
+
+VALIDACIONES_REFERENCIAS = [
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT t.fila, 'Usuario ' || t.id_usuario || ' no existe'
+    FROM staging_tipado t
+    WHERE NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.id = t.id_usuario)
+    """,
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT t.fila, 'Rol ' || t.id_rol || ' no existe'
+    FROM staging_tipado t
+    WHERE NOT EXISTS (SELECT 1 FROM roles r WHERE r.id = t.id_rol)
+    """,
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT t.fila, 'Regional ' || t.id_regional || ' no existe'
+    FROM staging_tipado t
+    WHERE t.id_regional IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM regionales reg WHERE reg.id = t.id_regional)
+    """,
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT t.fila, 'Centro ' || t.id_centro || ' no existe'
+    FROM staging_tipado t
+    WHERE t.id_centro IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM centros c WHERE c.id = t.id_centro)
+    """,
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT t.fila, 'Compromiso ' || t.id_compromiso || ' no existe o está inactivo'
+    FROM staging_tipado t
+    WHERE NOT EXISTS (
+        SELECT 1 FROM compromisos c WHERE c.id = t.id_compromiso AND c.estado = TRUE
+    )
+    """,
+    """
+    INSERT INTO staging_errores (fila, error)
+    SELECT d.fila, 'Duplicada de la fila ' || d.primera_fila
+    FROM (
+        SELECT
+            fila,
+            first_value(fila) OVER w AS primera_fila,
+            row_number() OVER w AS n
+        FROM staging_tipado
+        WINDOW w AS (PARTITION BY id_usuario, id_rol, id_compromiso ORDER BY fila)
+    ) d
+    WHERE d.n > 1
+    """,
+]
+
+DESCARTAR_INVALIDAS = """
+DELETE FROM staging_tipado t
+USING staging_errores e
+WHERE t.fila = e.fila
+"""
+
+# ============================================
+# MERGE (dentro del ciclo destino)
+# ============================================
+
+ACTUALIZAR_EXISTENTES = """
+UPDATE usuario_compromiso_asignacion uca
+SET id_regional = t.id_regional, id_centro = t.id_centro, estado = TRUE
+FROM staging_tipado t
+WHERE uca.id_usuario = t.id_usuario
+  AND uca.id_rol = t.id_rol
+  AND uca.id_compromiso = t.id_compromiso
+  AND uca.ciclo = %(ciclo)s
+"""
+
+INSERTAR_NUEVAS = """
+INSERT INTO usuario_compromiso_asignacion
+(id_usuario, id_rol, id_regional, id_centro, id_compromiso, estado, ciclo)
+SELECT t.id_usuario, t.id_rol, t.id_regional, t.id_centro, t.id_compromiso, TRUE, %(ciclo)s
+FROM staging_tipado t
+WHERE NOT EXISTS (
+    SELECT 1 FROM usuario_compromiso_asignacion uca
+    WHERE uca.id_usuario = t.id_usuario
+      AND uca.id_rol = t.id_rol
+      AND uca.id_compromiso = t.id_compromiso
+      AND uca.ciclo = %(ciclo)s
+)
+"""
+
+REPORTE_ERRORES = """
+SELECT fila, string_agg(error, '; ' ORDER BY error)
+FROM staging_errores
+GROUP BY fila
+ORDER BY fila
+LIMIT %s
+"""
+
+
+class ErrorImportacion(Exception):
+    """Archivo CSV con formato inválido"""
+
+
+async def _leer_cabecera(bloques: AsyncIterator[bytes]) -> bytes:
+    """Consumir y validar la primera línea; devuelve lo leído después de ella"""
+    leido = b""
+    while b"\n" not in leido:
+        if len(leido) > MAX_BYTES_CABECERA:
+            raise ErrorImportacion("La primera línea no es una cabecera válida")
+        try:
+            leido += await bloques.__anext__()
+        except StopAsyncIteration:
+            if not leido:
+                raise ErrorImportacion("Archivo vacío")
+            break
+    linea, _, resto = leido.partition(b"\n")
+
+    # Se aceptan BOM y fin de línea \r\n (CSV exportado desde Excel)
+    cabecera = linea.decode("utf-8-sig", errors="replace").rstrip("\r")
+    if cabecera != CABECERA:
+        raise ErrorImportacion(f"Cabecera {cabecera[:200]!r}; se esperaba {CABECERA!r}")
+    return resto
+
+
+async def importar_asignaciones(
+    conn: psycopg.AsyncConnection, contenido: AsyncIterator[bytes], ciclo: int
+) -> dict:
+    """Cargar CSV de asignaciones vía COPY, validar y hacer merge en el ciclo dado.
+
+    El ciclo lo resuelve ciclos.ciclo_destino_importacion.
+    No hace commit: la transacción la controla quien llama.
+    """
+    bloques = contenido.__aiter__()
+    resto = await _leer_cabecera(bloques)
+
+    async with conn.cursor() as cur:
+        await cur.execute(CREAR_STAGING)
+
+        try:
+            async with cur.copy(COPY_STAGING) as copy:
+                if resto:
+                    await copy.write(resto)
+                async for bloque in bloques:
+                    await copy.write(bloque)
+        except psycopg.DataError as e:
+            raise ErrorImportacion(str(e).strip()) from e
+
+        await cur.execute("SELECT COUNT(*) FROM staging_asignaciones")
+        total_filas = (await cur.fetchone())[0]
+
+        await cur.execute(VALIDAR_FORMATO)
+        await cur.execute(CREAR_STAGING_TIPADO)
+        # Las tablas temporales no tienen estadísticas (autovacuum no las ve):
+        # sin esto el planner estima pocas filas para los anti-joins siguientes
+        await cur.execute("ANALYZE staging_tipado")
+        for query in VALIDACIONES_REFERENCIAS:
+            await cur.execute(query)
+        await cur.execute(DESCARTAR_INVALIDAS)
+
+        await cur.execute(ACTUALIZAR_EXISTENTES, {"ciclo": ciclo})
+        actualizadas = cur.rowcount
+        await cur.execute(INSERTAR_NUEVAS, {"ciclo": ciclo})
+        insertadas = cur.rowcount
+
+        await cur.execute("SELECT COUNT(DISTINCT fila) FROM staging_errores")
+        total_errores = (await cur.fetchone())[0]
+
+        await cur.execute(REPORTE_ERRORES, (settings.importacion_max_errores,))
+        errores = [{"fila": row[0], "error": row[1]} for row in await cur.fetchall()]
+
+    return {
+        "ciclo": ciclo,
+        "total_filas": total_filas,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "total_errores": total_errores,
+        "errores": errores,
+    }
+
+
+async def importar_en_ciclo(
+    db: AsyncSession, contenido: AsyncIterator[bytes], ciclo: Optional[int] = None
+) -> dict:
+    """importar_asignaciones sobre la conexión de la sesión, en el ciclo abierto
+    o en el indicado (que se prepara si no existe). No hace commit.
+
+    Errores: ErrorCiclo si el ciclo no admite importaciones, ErrorImportacion
+    si el CSV es inválido.
+    """
+    ciclo = await ciclo_destino_importacion(db, ciclo)
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    return await importar_asignaciones(raw.driver_connection, contenido, ciclo)
+
+
+# ============================================
+# CLI
+# ============================================
+
+
+async def _leer_archivo(ruta: str, tamano_bloque: int = 1 << 20):
+    with open(ruta, "rb") as archivo:
+        while bloque := archivo.read(tamano_bloque):
+            yield bloque
+
+
+async def _main(ruta: str, ciclo: Optional[int]):
+    from database import async_session, engine
+
+    try:
+        async with async_session() as db:
+            resultado = await importar_en_ciclo(db, _leer_archivo(ruta), ciclo)
+            await db.commit()
+    except (ErrorCiclo, ErrorImportacion) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        await engine.dispose()
+
+    print(
+        f"Ciclo: {resultado['ciclo']} | "
+        f"filas: {resultado['total_filas']} | "
+        f"insertadas: {resultado['insertadas']} | "
+        f"actualizadas: {resultado['actualizadas']} | "
+        f"con error: {resultado['total_errores']}"
+    )
+    for error in resultado["errores"]:
+        print(f"  fila {error['fila']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importar asignaciones desde CSV")
+    parser.add_argument("archivo", help="CSV id_usuario,id_rol,id_regional,id_centro,id_compromiso")
+    parser.add_argument(
+        "--ciclo", type=int, help="Ciclo destino (por defecto el abierto); se prepara si no existe"
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.archivo, args.ciclo))
@@ -1,10 +1,98 @@
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from auditoria import registro_auditoria
+from config import settings
+from database import engine, precalentar_pool, usa_memoria, verificar_conexion
+from escritura_diferida import buffer_selecciones
+from migraciones import verificar_esquema
 from routes import router
+from notificaciones import difusor_validaciones
+from trabajos import gestor_trabajos
+
+logger = logging.getLogger(__name__)
+
+# El buffer de escritura diferida vive en cada proceso: con varios workers una
+# lectura puede caer en otro proceso y no ver la selección que aún no se guardó
+ERROR_ESCRITURA_DIFERIDA_WORKERS = (
+    "ESCRITURA_DIFERIDA=true requiere un solo worker (WORKERS=1 / --workers 1)"
+)
+
+
+async def _iniciar(nombre: str, paso) -> bool:
+    """Ejecutar un paso del arranque; si falla se registra y se sigue con el resto"""
+    try:
+        await paso()
+    except Exception:
+        logger.exception("Falló el arranque de %s", nombre)
+        return False
+    return True
+
+
+async def _reintentar_arranque(app: FastAPI):
+    """Reintentar los pasos que fallaron hasta que arranquen todos"""
+    while app.state.pendientes:
+        await asyncio.sleep(settings.reintento_arranque_segundos)
+        for nombre, paso in list(app.state.pendientes.items()):
+            if await _iniciar(nombre, paso):
+                logger.info("Arrancó %s", nombre)
+                del app.state.pendientes[nombre]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.escritura_diferida and settings.workers > 1:
+        raise RuntimeError(ERROR_ESCRITURA_DIFERIDA_WORKERS)
+    app.state.iniciado = False
+    # nombre -> paso del arranque que falló; /health/ready falla mientras haya alguno
+    app.state.pendientes = {}
+    reintentos = None
+    if usa_memoria():
+        # Sin Postgres: ni pool, ni trabajos, ni auditoría, ni LISTEN
+        logger.warning("Backend de datos en memoria: solo para pruebas")
+    else:
+        # Cada paso por separado: que falle uno no deja sin arrancar a los demás
+        pasos = {
+            "pool de conexiones": precalentar_pool,
+            "verificación de esquema": verificar_esquema,
+            "auditoría": registro_auditoria.iniciar,
+            "trabajos": gestor_trabajos.iniciar,
+            "notificaciones": difusor_validaciones.iniciar,
+        }
+        for nombre, paso in pasos.items():
+            if not await _iniciar(nombre, paso):
+                app.state.pendientes[nombre] = paso
+        if app.state.pendientes:
+            reintentos = asyncio.create_task(_reintentar_arranque(app))
+    if settings.escritura_diferida:
+        await buffer_selecciones.iniciar()
+    app.state.iniciado = True
+
+    yield
+
+    app.state.iniciado = False
+    if reintentos:
+        reintentos.cancel()
+        await asyncio.gather(reintentos, return_exceptions=True)
+    if settings.escritura_diferida:
+        # Guardar las selecciones pendientes antes de cerrar el pool
+        await buffer_selecciones.detener()
+    await difusor_validaciones.detener()
+    await gestor_trabajos.detener()
+    await registro_auditoria.detener()
+    await engine.dispose()
+
 
 app = FastAPI(
     title="API Compromisos y Acciones",
     description="API para gestión de compromisos y acciones",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Incluir rutas
@@ -17,7 +105,40 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """El proceso está vivo (no consulta dependencias)"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Listo para recibir tráfico: arranque completo y BD disponible"""
+    if not app.state.iniciado:
+        return JSONResponse(status_code=503, content={"status": "iniciando"})
+    if app.state.pendientes:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "arranque incompleto", "pendientes": list(app.state.pendientes)},
+        )
+    if not usa_memoria() and not await verificar_conexion():
+        return JSONResponse(status_code=503, content={"status": "sin base de datos"})
+    return {"status": "ok"}
+
+
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="API Compromisos y Acciones")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.workers)
+    args = parser.parse_args()
+    if settings.escritura_diferida and args.workers > 1:
+        parser.error(ERROR_ESCRITURA_DIFERIDA_WORKERS)
+
+    if args.workers > 1:
+        # Con varios workers uvicorn necesita la app como "modulo:atributo"
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
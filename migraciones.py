@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = Path(__file__).parent / "migraciones_sql"
+DIRECTORIO_OPCIONALES = DIRECTORIO / "opcionales"
+
+# Primera línea de las migraciones que no pueden ir en una transacción
+# (CREATE INDEX CONCURRENTLY): se ejecutan sentencia por sentencia en autocommit
+SIN_TRANSACCION = "-- sin transaccion"
+
+CREAR_TABLA_VERSIONES = """
+CREATE TABLE IF NOT EXISTS schema_migraciones (
+    version TEXT PRIMARY KEY,
+    fecha_aplicacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Índices que las consultas calientes necesitan: (tabla, columnas iniciales).
+# Sirve cualquier índice cuyas primeras columnas coincidan, sin importar el nombre.
+INDICES_REQUERIDOS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("usuario_compromiso_asignacion", ("id_usuario", "id_rol", "id_compromiso", "estado")),
+    ("usuario_compromiso_asignacion", ("id_regional", "id_centro")),
+    ("acciones", ("id_rol", "id_compromiso", "estado")),
+    (
+        "usuario_compromiso_accion_seleccion",
+        ("id_usuario_compromiso_asignacion", "id_accion", "ciclo"),
+    ),
+    ("usuario_accion_innovacion", ("id_usuario_compromiso_asignacion",)),
+    ("usuario_rol_regional", ("id_usuario",)),
+    ("usuario_rol_centro", ("id_usuario",)),
+    ("usuarios", ("email",)),
+    ("auditoria_cambios", ("id_usuario_compromiso_asignacion", "id")),
+]
+
+QUERY_INDICES = """
+SELECT t.relname, array_agg(a.attname::text ORDER BY k.orden)
+FROM pg_index i
+JOIN pg_class t ON t.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, orden)
+JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+WHERE n.nspname = current_schema() AND t.relname = ANY(:tablas)
+  AND i.indisvalid
+GROUP BY i.indexrelid, t.relname
+"""
+
+# Un CREATE INDEX CONCURRENTLY que falla deja el índice creado pero inválido
+QUERY_INDICES_INVALIDOS = """
+SELECT c.relname
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = current_schema() AND NOT i.indisvalid
+ORDER BY c.relname
+"""
+
+
+class ErrorMigracion(Exception):
+    """Esquema desactualizado o migración que no terminó bien"""
+
+
+def _archivos(directorio: Path) -> List[Path]:
+    return sorted(directorio.glob("*.sql"))
+
+
+async def _aplicadas(conn) -> set:
+    await conn.execute(text(CREAR_TABLA_VERSIONES))
+    result = await conn.execute(text("SELECT version FROM schema_migraciones"))
+    return {row[0] for row in result}
+
+
+def _sentencias(script: str) -> List[str]:
+    """Sentencias de un script sin cuerpos $$ (el de las migraciones sin transacción)"""
+    sentencias = []
+    for bloque in re.split(r";\s*$", script, flags=re.MULTILINE):
+        codigo = [l for l in bloque.splitlines() if l.strip() and not l.strip().startswith("--")]
+        if codigo:
+            sentencias.append("\n".join(codigo))
+    return sentencias
+
+
+async def _aplicar_sin_transaccion(archivo: Path, script: str):
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for sentencia in _sentencias(script):
+            await conn.execute(text(sentencia))
+
+        invalidos = [row[0] for row in await conn.execute(text(QUERY_INDICES_INVALIDOS))]
+        if invalidos:
+            # IF NOT EXISTS no rehace un índice inválido: hay que borrarlo antes de reintentar
+            raise ErrorMigracion(
+                f"{archivo.stem}: índices inválidos {', '.join(invalidos)} "
+                "(DROP INDEX CONCURRENTLY y volver a ejecutar)"
+            )
+        await conn.execute(
+            text("INSERT INTO schema_migraciones (version) VALUES (:version)"),
+            {"version": archivo.stem},
+        )
+
+
+async def aplicar_migraciones(particionar: bool = False) -> List[str]:
+    """Aplicar en orden las migraciones pendientes (cada una en su transacción,
+    salvo las marcadas con SIN_TRANSACCION)"""
+    archivos = _archivos(DIRECTORIO)
+    if particionar:
+        archivos += _archivos(DIRECTORIO_OPCIONALES)
+
+    async with engine.begin() as conn:
+        aplicadas = await _aplicadas(conn)
+
+    nuevas = []
+    for archivo in archivos:
+        if archivo.stem in aplicadas:
+            continue
+        script = archivo.read_text(encoding="utf-8")
+        if script.startswith(SIN_TRANSACCION):
+            await _aplicar_sin_transaccion(archivo, script)
+            nuevas.append(archivo.stem)
+            continue
+        async with engine.begin() as conn:
+            # Script completo con varias sentencias: va directo al driver
+            raw = await conn.get_raw_connection()
+            async with raw.driver_connection.cursor() as cur:
+                await cur.execute(script)
+            await conn.execute(
+                text("INSERT INTO schema_migraciones (version) VALUES (:version)"),
+                {"version": archivo.stem},
+            )
+        nuevas.append(archivo.stem)
+    return nuevas
+
+
+async def indices_faltantes() -> List[str]:
+    """Índices requeridos que no existen en la base de datos"""
+    tablas = sorted({tabla for tabla, _ in INDICES_REQUERIDOS})
+    async with engine.connect() as conn:
+        result = await conn.execute(text(QUERY_INDICES), {"tablas": tablas})
+        existentes = [(row[0], tuple(row[1])) for row in result]
+
+    faltantes = []
+    for tabla, columnas in INDICES_REQUERIDOS:
+        if not any(
+            t == tabla and cols[: len(columnas)] == columnas for t, cols in existentes
+        ):
+            faltantes.append(f"{tabla} ({', '.join(columnas)})")
+    return faltantes
+
+
+async def verificar_esquema():
+    """Fallar el arranque si hay migraciones pendientes; advertir si faltan índices.
+
+    Con migraciones pendientes /health/ready sigue en 503 y el paso se reintenta
+    hasta que se apliquen. Solo lee: no crea schema_migraciones si no existe.
+    """
+    async with engine.connect() as conn:
+        existe = (
+            await conn.execute(text("SELECT to_regclass('schema_migraciones')"))
+        ).scalar()
+        aplicadas = set()
+        if existe is not None:
+            result = await conn.execute(text("SELECT version FROM schema_migraciones"))
+            aplicadas = {row[0] for row in result}
+    pendientes = [a.stem for a in _archivos(DIRECTORIO) if a.stem not in aplicadas]
+    if pendientes:
+        raise ErrorMigracion(
+            f"Migraciones pendientes: {', '.join(pendientes)} (ejecutar: python migraciones.py)"
+        )
+
+    for indice in await indices_faltantes():
+        logger.warning("Falta índice requerido en %s", indice)
+
+
+async def _main(particionar: bool, verificar: bool):
+    try:
+        if verificar:
+            faltantes = await indices_faltantes()
+            for indice in faltantes:
+                print(f"Falta índice: {indice}")
+            if not faltantes:
+                print("Todos los índices requeridos existen")
+            return
+
+        try:
+            nuevas = await aplicar_migraciones(particionar)
+        except ErrorMigracion as e:
+            print(f"Error: {e}")
+            return
+        for version in nuevas:
+            print(f"Aplicada: {version}")
+        if not nuevas:
+            print("No hay migraciones pendientes")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de esquema")
+    parser.add_argument(
+        "--particionar",
+        action="store_true",
+        help="Aplicar también el particionado por ciclo (migraciones_sql/opcionales)",
+    )
+    parser.add_argument(
+        "--verificar", action="store_true", help="Solo listar índices faltantes"
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.particionar, args.verificar))
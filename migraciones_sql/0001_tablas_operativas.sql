@@ -0,0 +1,41 @@
+-- Tablas propias de la API (resultados del barrido, reportes y auditoría)
+
+CREATE TABLE IF NOT EXISTS validacion_pesos_resultado (
+    id_usuario_compromiso_asignacion BIGINT PRIMARY KEY,
+    id_usuario BIGINT NOT NULL,
+    id_rol BIGINT NOT NULL,
+    id_compromiso BIGINT NOT NULL,
+    total_acciones INTEGER NOT NULL,
+    suma_pesos NUMERIC(7, 2) NOT NULL,
+    peso_real_en_total NUMERIC(7, 2) NOT NULL,
+    es_valido BOOLEAN NOT NULL,
+    fecha_calculo TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trabajos_reporte (
+    id BIGSERIAL PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    parametros JSONB NOT NULL DEFAULT '{}',
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    id_usuario_solicitante BIGINT,
+    error TEXT,
+    resultado JSONB,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_inicio TIMESTAMP,
+    fecha_latido TIMESTAMP,
+    fecha_fin TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS auditoria_cambios (
+    id BIGSERIAL PRIMARY KEY,
+    fecha TIMESTAMP NOT NULL,
+    tabla TEXT NOT NULL,
+    operacion TEXT NOT NULL,
+    id_registro BIGINT,
+    id_usuario_compromiso_asignacion BIGINT NOT NULL,
+    id_usuario_actor BIGINT,
+    datos JSONB NOT NULL DEFAULT '{}'
+);
+
+CREATE INDEX IF NOT EXISTS idx_auditoria_cambios_asignacion
+    ON auditoria_cambios (id_usuario_compromiso_asignacion, id DESC);
@@ -0,0 +1,27 @@
+-- sin transaccion
+-- Índices que necesitan las consultas de routes.py. CONCURRENTLY no bloquea las
+-- escrituras mientras se construyen; por eso esta migración va sin transacción.
+
+-- Búsqueda de la asignación por usuario/rol/compromiso (casi todos los endpoints)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_uca_usuario_rol_compromiso
+    ON usuario_compromiso_asignacion (id_usuario, id_rol, id_compromiso, estado);
+
+-- Dashboard de cumplimiento por regional y centro
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_uca_regional_centro
+    ON usuario_compromiso_asignacion (id_regional, id_centro)
+    WHERE estado = TRUE;
+
+-- Acciones disponibles por rol y compromiso
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_acciones_rol_compromiso
+    ON acciones (id_rol, id_compromiso, estado);
+
+-- Innovaciones por asignación (listado ordenado por fecha)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_uai_asignacion_fecha
+    ON usuario_accion_innovacion (id_usuario_compromiso_asignacion, fecha_creacion DESC);
+
+-- Roles del usuario (login, resumen, listados)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_urr_usuario
+    ON usuario_rol_regional (id_usuario);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_urc_usuario
+    ON usuario_rol_centro (id_usuario);
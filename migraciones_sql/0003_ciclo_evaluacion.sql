@@ -0,0 +1,36 @@
+-- Ciclo de evaluación en asignaciones, selecciones e innovaciones.
+-- Por defecto el ciclo es el año calendario; si los ciclos se definen de otra
+-- forma basta con reemplazar ciclo_actual().
+
+CREATE OR REPLACE FUNCTION ciclo_actual() RETURNS INTEGER
+LANGUAGE sql STABLE AS $$
+    SELECT EXTRACT(YEAR FROM CURRENT_DATE)::int
+$$;
+
+ALTER TABLE usuario_compromiso_asignacion
+    ADD COLUMN IF NOT EXISTS ciclo INTEGER NOT NULL DEFAULT ciclo_actual();
+
+ALTER TABLE usuario_compromiso_accion_seleccion
+    ADD COLUMN IF NOT EXISTS ciclo INTEGER NOT NULL DEFAULT ciclo_actual();
+
+ALTER TABLE usuario_accion_innovacion
+    ADD COLUMN IF NOT EXISTS ciclo INTEGER NOT NULL DEFAULT ciclo_actual();
+
+-- Las filas existentes toman el ciclo de su asignación
+UPDATE usuario_compromiso_accion_seleccion ucas
+SET ciclo = uca.ciclo
+FROM usuario_compromiso_asignacion uca
+WHERE ucas.id_usuario_compromiso_asignacion = uca.id AND ucas.ciclo <> uca.ciclo;
+
+UPDATE usuario_accion_innovacion uai
+SET ciclo = uca.ciclo
+FROM usuario_compromiso_asignacion uca
+WHERE uai.id_usuario_compromiso_asignacion = uca.id AND uai.ciclo <> uca.ciclo;
+
+CREATE INDEX IF NOT EXISTS idx_uca_ciclo
+    ON usuario_compromiso_asignacion (ciclo);
+
+-- Destino del ON CONFLICT de las selecciones. Incluye el ciclo para que
+-- sirva también si la tabla se particiona por ciclo.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_ucas_asignacion_accion_ciclo
+    ON usuario_compromiso_accion_seleccion (id_usuario_compromiso_asignacion, id_accion, ciclo);
@@ -0,0 +1,37 @@
+-- Ciclo de evaluación explícito: lo abre un admin (python ciclos.py --abrir 2027).
+-- La fecha no cambia nada: hasta que se abra el siguiente, la API sigue en el
+-- ciclo abierto. Un ciclo en preparación recibe importaciones pero no se lee.
+
+CREATE TABLE IF NOT EXISTS ciclos_evaluacion (
+    ciclo INTEGER PRIMARY KEY,
+    estado TEXT NOT NULL DEFAULT 'preparacion'
+        CHECK (estado IN ('preparacion', 'abierto', 'cerrado')),
+    fecha_apertura TIMESTAMP,
+    fecha_cierre TIMESTAMP
+);
+
+-- A lo sumo un ciclo abierto
+CREATE UNIQUE INDEX IF NOT EXISTS ux_ciclos_evaluacion_abierto
+    ON ciclos_evaluacion (estado) WHERE estado = 'abierto';
+
+-- Ciclos que ya tienen datos: el más reciente queda abierto, los anteriores cerrados
+INSERT INTO ciclos_evaluacion (ciclo, estado, fecha_apertura, fecha_cierre)
+SELECT
+    ciclo,
+    CASE WHEN ciclo = max(ciclo) OVER () THEN 'abierto' ELSE 'cerrado' END,
+    CURRENT_TIMESTAMP,
+    CASE WHEN ciclo = max(ciclo) OVER () THEN NULL ELSE CURRENT_TIMESTAMP END
+FROM (SELECT DISTINCT ciclo FROM usuario_compromiso_asignacion) c
+ON CONFLICT (ciclo) DO NOTHING;
+
+-- Base sin asignaciones: se abre el año en curso
+INSERT INTO ciclos_evaluacion (ciclo, estado, fecha_apertura)
+SELECT EXTRACT(YEAR FROM CURRENT_DATE)::int, 'abierto', CURRENT_TIMESTAMP
+WHERE NOT EXISTS (SELECT 1 FROM ciclos_evaluacion WHERE estado = 'abierto');
+
+-- Reemplaza la versión de 0003 (año calendario). Las consultas la usan como
+-- (SELECT ciclo_actual()) para que se evalúe una vez y no por fila.
+CREATE OR REPLACE FUNCTION ciclo_actual() RETURNS INTEGER
+LANGUAGE sql STABLE AS $$
+    SELECT ciclo FROM ciclos_evaluacion WHERE estado = 'abierto'
+$$;
@@ -0,0 +1,98 @@
+-- Particiona selecciones e innovaciones por ciclo de evaluación (LIST).
+-- Opcional: uv run python migraciones.py --particionar
+-- Requiere 0003. Reescribe ambas tablas dentro de una sola transacción.
+--
+-- Antes de cada ciclo nuevo: SELECT crear_particiones_ciclo(<ciclo>);
+-- (si no, las filas caen en la partición _default).
+
+CREATE OR REPLACE FUNCTION crear_particiones_ciclo(p_ciclo INTEGER) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF usuario_compromiso_accion_seleccion FOR VALUES IN (%s)',
+        'usuario_compromiso_accion_seleccion_' || p_ciclo, p_ciclo
+    );
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF usuario_accion_innovacion FOR VALUES IN (%s)',
+        'usuario_accion_innovacion_' || p_ciclo, p_ciclo
+    );
+END;
+$$;
+
+-- ============================================
+-- SELECCIONES
+-- ============================================
+
+ALTER TABLE usuario_compromiso_accion_seleccion RENAME TO ucas_sin_particionar;
+ALTER INDEX ux_ucas_asignacion_accion_ciclo RENAME TO ux_ucas_asignacion_accion_ciclo_sin_particionar;
+
+CREATE TABLE usuario_compromiso_accion_seleccion (
+    LIKE ucas_sin_particionar INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY LIST (ciclo);
+
+ALTER TABLE usuario_compromiso_accion_seleccion
+    ADD PRIMARY KEY (id, ciclo),
+    ADD FOREIGN KEY (id_usuario_compromiso_asignacion) REFERENCES usuario_compromiso_asignacion (id),
+    ADD FOREIGN KEY (id_accion) REFERENCES acciones (id);
+
+CREATE UNIQUE INDEX ux_ucas_asignacion_accion_ciclo
+    ON usuario_compromiso_accion_seleccion (id_usuario_compromiso_asignacion, id_accion, ciclo);
+
+CREATE TABLE usuario_compromiso_accion_seleccion_default
+    PARTITION OF usuario_compromiso_accion_seleccion DEFAULT;
+
+-- ============================================
+-- INNOVACIONES
+-- ============================================
+
+ALTER TABLE usuario_accion_innovacion RENAME TO uai_sin_particionar;
+ALTER INDEX idx_uai_asignacion_fecha RENAME TO idx_uai_asignacion_fecha_sin_particionar;
+
+CREATE TABLE usuario_accion_innovacion (
+    LIKE uai_sin_particionar INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY LIST (ciclo);
+
+ALTER TABLE usuario_accion_innovacion
+    ADD PRIMARY KEY (id, ciclo),
+    ADD FOREIGN KEY (id_usuario_compromiso_asignacion) REFERENCES usuario_compromiso_asignacion (id);
+
+CREATE INDEX idx_uai_asignacion_fecha
+    ON usuario_accion_innovacion (id_usuario_compromiso_asignacion, fecha_creacion DESC);
+
+CREATE TABLE usuario_accion_innovacion_default
+    PARTITION OF usuario_accion_innovacion DEFAULT;
+
+-- ============================================
+-- PARTICIONES, DATOS Y SECUENCIAS
+-- ============================================
+
+-- Las particiones se crean antes de copiar para que nada quede en _default
+SELECT crear_particiones_ciclo(ciclo)
+FROM (
+    SELECT ciclo FROM ucas_sin_particionar
+    UNION SELECT ciclo FROM uai_sin_particionar
+    UNION SELECT ciclo_actual()
+) ciclos;
+
+INSERT INTO usuario_compromiso_accion_seleccion SELECT * FROM ucas_sin_particionar;
+INSERT INTO usuario_accion_innovacion SELECT * FROM uai_sin_particionar;
+
+-- Los ids siguen saliendo de las secuencias originales
+DO $$
+DECLARE
+    secuencia TEXT;
+BEGIN
+    secuencia := pg_get_serial_sequence('ucas_sin_particionar', 'id');
+    IF secuencia IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY usuario_compromiso_accion_seleccion.id', secuencia);
+    END IF;
+
+    secuencia := pg_get_serial_sequence('uai_sin_particionar', 'id');
+    IF secuencia IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY usuario_accion_innovacion.id', secuencia);
+    END IF;
+END;
+$$;
+
+DROP TABLE ucas_sin_particionar;
+DROP TABLE uai_sin_particionar;
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Dict, Set, Tuple
+
+import psycopg
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CANAL_VALIDACION = "validacion_pesos"
+
+
+class DifusorValidaciones:
+    """Reparte los NOTIFY de Postgres a las conexiones SSE de este proceso.
+
+    Cada suscriptor tiene una cola acotada: si el cliente es lento, los avisos
+    que no caben se descartan (basta con uno pendiente para que recalcule).
+    """
+
+    def __init__(self, tamano_buffer: int = 1, espera_reconexion: float = 5):
+        self.tamano_buffer = tamano_buffer
+        self.espera_reconexion = espera_reconexion
+        self._suscriptores: Dict[Tuple[int, int], Set[asyncio.Queue]] = {}
+        self._tarea = None
+
+    async def iniciar(self):
+        self._tarea = asyncio.create_task(self._escuchar())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+
+    def suscribir(self, usuario_id: int, id_rol: int) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=self.tamano_buffer)
+        self._suscriptores.setdefault((usuario_id, id_rol), set()).add(cola)
+        return cola
+
+    def desuscribir(self, usuario_id: int, id_rol: int, cola: asyncio.Queue):
+        colas = self._suscriptores.get((usuario_id, id_rol))
+        if colas:
+            colas.discard(cola)
+            if not colas:
+                del self._suscriptores[(usuario_id, id_rol)]
+
+    def publicar(self, payload: str):
+        """Entregar un aviso "usuario:rol" a los suscriptores de este proceso"""
+        try:
+            usuario_id, id_rol = (int(x) for x in payload.split(":"))
+        except ValueError:
+            logger.warning("Payload de notificación inválido: %r", payload)
+            return
+
+        for cola in self._suscriptores.get((usuario_id, id_rol), ()):
+            try:
+                cola.put_nowait(payload)
+            except asyncio.QueueFull:
+                pass
+
+    def refrescar_todos(self):
+        """Pedir a todos los suscriptores de este proceso que recalculen"""
+        for (usuario_id, id_rol), colas in self._suscriptores.items():
+            for cola in colas:
+                try:
+                    cola.put_nowait(f"{usuario_id}:{id_rol}")
+                except asyncio.QueueFull:
+                    pass
+
+    async def _escuchar(self):
+        # Conexión dedicada fuera del pool: LISTEN la ocupa de forma permanente
+        reconexion = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    settings.url_psycopg(), autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {CANAL_VALIDACION}")
+                    if reconexion:
+                        # Los NOTIFY enviados sin conexión se perdieron
+                        self.refrescar_todos()
+                    reconexion = True
+                    async for notificacion in conn.notifies():
+                        self.publicar(notificacion.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                reconexion = True
+                logger.exception(
+                    "Se perdió la conexión LISTEN; reintentando en %ss",
+                    self.espera_reconexion,
+                )
+                await asyncio.sleep(self.espera_reconexion)
+
+
+difusor_validaciones = DifusorValidaciones(settings.sse_buffer)
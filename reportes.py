@@ -0,0 +1,59 @@
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from repositorio_postgres import RepositorioPostgres
+
+# ============================================
+# REPORTES
+# ============================================
+
+
+async def generar_resumenes_regional(db: AsyncSession, parametros: dict) -> List[dict]:
+    """Resúmenes de todos los usuarios con asignaciones activas en una regional"""
+    repo = RepositorioPostgres(db)
+    usuarios_ids = await repo.listar_usuarios_regional(int(parametros["id_regional"]))
+
+    resumenes = []
+    for usuario_id in usuarios_ids:
+        resumen = await repo.obtener_resumen_usuario(usuario_id)
+        if resumen:
+            resumenes.append(resumen.model_dump(mode="json"))
+    return resumenes
+
+
+# Tipos de reporte que pueden ejecutarse como trabajo en segundo plano
+TIPOS_REPORTE = {
+    "resumenes_regional": generar_resumenes_regional,
+}
+
+# Parámetros obligatorios de cada tipo (nombre -> tipo); se validan al encolar
+PARAMETROS_REPORTE = {
+    "resumenes_regional": {"id_regional": int},
+}
+
+
+def validar_parametros(tipo: str, parametros: dict) -> dict:
+    """Parámetros del reporte con sus tipos; ValueError si falta, sobra o no
+    se puede convertir alguno (mejor fallar al encolar que en el trabajo)"""
+    esperados = PARAMETROS_REPORTE[tipo]
+    sobrantes = sorted(set(parametros) - set(esperados))
+    if sobrantes:
+        raise ValueError(f"Parámetros desconocidos para {tipo}: {', '.join(sobrantes)}")
+
+    validados = {}
+    for nombre, conversion in esperados.items():
+        if parametros.get(nombre) is None:
+            raise ValueError(f"El reporte {tipo} requiere el parámetro {nombre}")
+        valor = parametros[nombre]
+        # bool es subclase de int ({"id_regional": true} no es un id) e int()
+        # truncaría 1.5 sin avisar
+        if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+            valor = None
+        try:
+            validados[nombre] = conversion(valor)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"El parámetro {nombre} de {tipo} debe ser {conversion.__name__}"
+            ) from None
+    return validados
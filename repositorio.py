@@ -0,0 +1,157 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from schemas import (
+    AccionResponse,
+    AccionSeleccionResponse,
+    AccionInnovacionRequest,
+    AccionInnovacionResponse,
+    AuditoriaPaginaResponse,
+    CumplimientoGrupoResponse,
+    UsuarioCompromisoAsignacionResponse,
+    UsuarioResumenResponse,
+    ValidacionPesosResponse,
+)
+
+# Compromiso al que se asocian las acciones de innovación
+ID_COMPROMISO_INNOVACION = 3
+
+# Perfiles que gestionan compromisos
+ROLES_DIRECTIVOS = ("Director Regional", "Subdirector Centro")
+
+# Agrupación del dashboard de cumplimiento según el filtro
+NIVELES_CUMPLIMIENTO = ("regional", "centro", "usuario")
+
+
+class Repositorio(ABC):
+    """Acceso a datos de la API.
+
+    Los handlers solo hablan con esta interfaz; hay una implementación sobre
+    Postgres (repositorio_postgres) y otra en memoria (repositorio_memoria)
+    para pruebas de carga de la capa HTTP sin base de datos.
+
+    Todas las consultas se limitan a las asignaciones del ciclo abierto
+    (ciclos_evaluacion); los cerrados quedan para el histórico y los que
+    están en preparación no se leen hasta que se abren.
+
+    Quien escribe debe llamar a confirmar() al final (en Postgres es el commit).
+    """
+
+    # ---------- usuarios ----------
+
+    @abstractmethod
+    async def obtener_usuario_por_email(self, email: str) -> Optional[Tuple[int, str, str]]:
+        """(id, email, password) o None"""
+
+    @abstractmethod
+    async def listar_roles_usuario(self, usuario_id: int) -> List[str]:
+        """Nombres de los roles del usuario (regionales y de centro)"""
+
+    @abstractmethod
+    async def listar_directores_subdirectores(self) -> List[dict]:
+        """Usuarios con perfil directivo, ordenados por rol y email"""
+
+    @abstractmethod
+    async def contar_directores_subdirectores(self) -> Dict[str, int]:
+        """Usuarios distintos por rol directivo (roles regionales)"""
+
+    # ---------- asignaciones y acciones ----------
+
+    @abstractmethod
+    async def listar_asignaciones_usuario(
+        self, usuario_id: int
+    ) -> List[UsuarioCompromisoAsignacionResponse]:
+        """Asignaciones activas del usuario con su compromiso"""
+
+    @abstractmethod
+    async def obtener_asignacion(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> Optional[int]:
+        """Id de la asignación activa del ciclo abierto o None"""
+
+    @abstractmethod
+    async def listar_acciones_disponibles(
+        self, id_rol: int, compromiso_id: int
+    ) -> List[AccionResponse]:
+        """Acciones activas del rol y compromiso, obligatorias primero"""
+
+    @abstractmethod
+    async def existe_accion(self, id_accion: int, id_rol: int, compromiso_id: int) -> bool:
+        """La acción existe, está activa y corresponde al rol y compromiso"""
+
+    @abstractmethod
+    async def listar_acciones_seleccionadas(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> List[AccionSeleccionResponse]:
+        """Acciones elegidas en las asignaciones activas, obligatorias primero"""
+
+    @abstractmethod
+    async def guardar_seleccion(
+        self, id_asignacion: int, id_accion: int, peso: float
+    ) -> Tuple[int, bool]:
+        """Insertar o actualizar el peso; devuelve (id, insertado)"""
+
+    @abstractmethod
+    async def guardar_selecciones(self, selecciones: List[Tuple[int, int, float]]):
+        """Varias (id_asignacion, id_accion, peso) de una vez"""
+
+    # ---------- innovaciones ----------
+
+    @abstractmethod
+    async def contar_innovaciones(self, id_asignacion: int) -> int:
+        """Innovaciones activas de la asignación"""
+
+    @abstractmethod
+    async def crear_innovacion(
+        self, id_asignacion: int, datos: AccionInnovacionRequest
+    ) -> AccionInnovacionResponse:
+        """Registrar una innovación en la asignación"""
+
+    @abstractmethod
+    async def listar_innovaciones(
+        self, usuario_id: int, id_rol: int
+    ) -> List[AccionInnovacionResponse]:
+        """Innovaciones de las asignaciones activas, la más reciente primero"""
+
+    # ---------- validación y resumen ----------
+
+    @abstractmethod
+    async def validar_pesos(
+        self, usuario_id: int, id_rol: int
+    ) -> List[ValidacionPesosResponse]:
+        """Validación de pesos por compromiso de un usuario en un rol"""
+
+    @abstractmethod
+    async def obtener_resumen_usuario(
+        self, usuario_id: int
+    ) -> Optional[UsuarioResumenResponse]:
+        """Resumen del usuario con compromisos y acciones (None si no existe)"""
+
+    @abstractmethod
+    async def listar_usuarios_regional(self, id_regional: int) -> List[int]:
+        """Usuarios con asignaciones activas en la regional"""
+
+    @abstractmethod
+    async def cumplimiento_por_grupo(
+        self, nivel: str, id_regional: Optional[int], id_centro: Optional[int]
+    ) -> List[CumplimientoGrupoResponse]:
+        """Directivos (por usuario y rol) con todas sus asignaciones al 100%,
+        agrupados por regional, centro o usuario y ordenados por nombre"""
+
+    # ---------- auditoría ----------
+
+    @abstractmethod
+    async def listar_auditoria(
+        self, id_asignacion: int, antes_de: Optional[int], limite: int
+    ) -> AuditoriaPaginaResponse:
+        """Eventos de la asignación con id < antes_de, del más reciente al más antiguo"""
+
+    # ---------- transacción ----------
+
+    @abstractmethod
+    async def notificar_cambio_pesos(self, usuario_id: int, id_rol: int):
+        """Avisar a los suscriptores SSE; sale al confirmar"""
+
+    @abstractmethod
+    async def confirmar(self):
+        """Hacer efectivas las escrituras pendientes"""
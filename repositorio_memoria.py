@@ -0,0 +1,717 @@
+import itertools
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+from notificaciones import difusor_validaciones
+from repositorio import ID_COMPROMISO_INNOVACION, ROLES_DIRECTIVOS, Repositorio
+from schemas import (
+    AccionResponse,
+    AccionSeleccionResponse,
+    AccionInnovacionRequest,
+    AccionInnovacionResponse,
+    AuditoriaEventoResponse,
+    AuditoriaPaginaResponse,
+    CompromisoResponse,
+    CumplimientoGrupoResponse,
+    UsuarioCompromisoAsignacionResponse,
+    UsuarioResumenResponse,
+    CompromisoResumenResponse,
+    AccionResumenResponse,
+    ValidacionPesosResponse,
+)
+from validacion import construir_grupo_cumplimiento, construir_validacion, es_suma_valida
+
+# Tablas que se cargan (mismos nombres y columnas que en Postgres)
+TABLAS = [
+    "usuarios",
+    "roles",
+    "regionales",
+    "centros",
+    "usuario_rol_regional",
+    "usuario_rol_centro",
+    "compromisos",
+    "acciones",
+    "usuario_compromiso_asignacion",
+    "usuario_compromiso_accion_seleccion",
+    "usuario_accion_innovacion",
+    "ciclos_evaluacion",
+    "auditoria_cambios",
+]
+
+
+def _accion(accion: dict) -> AccionResponse:
+    return AccionResponse(
+        id=accion["id"],
+        nombre=accion["nombre"],
+        descripcion=accion.get("descripcion"),
+        obligatorio=accion["obligatorio"],
+        peso_fijo=float(accion["peso_fijo"]) if accion.get("peso_fijo") else None,
+        estado=accion["estado"],
+    )
+
+
+def _innovacion(innovacion: dict) -> AccionInnovacionResponse:
+    return AccionInnovacionResponse(
+        id=innovacion["id"],
+        nombre=innovacion["nombre"],
+        descripcion=innovacion.get("descripcion"),
+        peso_porcentual_usuario=float(innovacion["peso_porcentual_usuario"]),
+        evidencias=innovacion.get("evidencias"),
+        estado=innovacion["estado"],
+        fecha_creacion=innovacion["fecha_creacion"],
+    )
+
+
+class RepositorioMemoria(Repositorio):
+    """Repositorio sin base de datos: diccionarios indexados por las mismas
+    claves que filtran las consultas de Postgres.
+
+    Una sola instancia por proceso, compartida por todas las peticiones. Los
+    métodos no hacen E/S, así que cada uno corre sin ceder el event loop y no
+    necesita locks. Las escrituras son inmediatas; los avisos SSE salen al
+    confirmar().
+    """
+
+    def __init__(self, datos: Dict[str, List[dict]]):
+        tablas = {tabla: [dict(fila) for fila in datos.get(tabla, [])] for tabla in TABLAS}
+
+        self.usuarios = {u["id"]: u for u in tablas["usuarios"]}
+        self.usuarios_por_email = {u["email"]: u for u in tablas["usuarios"]}
+        self.roles = {r["id"]: r for r in tablas["roles"]}
+        self.regionales = {r["id"]: r for r in tablas["regionales"]}
+        self.centros = {c["id"]: c for c in tablas["centros"]}
+        self.compromisos = {c["id"]: c for c in tablas["compromisos"]}
+        self.acciones = {a["id"]: a for a in tablas["acciones"]}
+
+        self.roles_regionales_por_usuario: Dict[int, List[dict]] = {}
+        for urr in tablas["usuario_rol_regional"]:
+            self.roles_regionales_por_usuario.setdefault(urr["id_usuario"], []).append(urr)
+        self.roles_centro_por_usuario: Dict[int, List[dict]] = {}
+        for urc in tablas["usuario_rol_centro"]:
+            self.roles_centro_por_usuario.setdefault(urc["id_usuario"], []).append(urc)
+
+        # (id_rol, id_compromiso) -> acciones activas, obligatorias primero
+        self.acciones_por_rol_compromiso: Dict[Tuple[int, int], List[dict]] = {}
+        for accion in sorted(self.acciones.values(), key=lambda a: (not a["obligatorio"], a["id"])):
+            if accion["estado"]:
+                clave = (accion["id_rol"], accion["id_compromiso"])
+                self.acciones_por_rol_compromiso.setdefault(clave, []).append(accion)
+
+        # Igual que ciclo_actual() en la base: la fila 'abierto' de ciclos_evaluacion.
+        # Sin esa tabla en los datos, el último ciclo con asignaciones (como siembra 0004)
+        abiertos = [c["ciclo"] for c in tablas["ciclos_evaluacion"] if c["estado"] == "abierto"]
+        ciclos_cargados = [
+            a["ciclo"] for a in tablas["usuario_compromiso_asignacion"] if "ciclo" in a
+        ]
+        self.ciclo_abierto = (
+            abiertos[0] if abiertos else max(ciclos_cargados, default=datetime.now().year)
+        )
+
+        self.asignaciones: Dict[int, dict] = {}
+        self.asignaciones_por_usuario: Dict[int, List[dict]] = {}
+        for asignacion in sorted(tablas["usuario_compromiso_asignacion"], key=lambda a: a["id"]):
+            asignacion.setdefault("ciclo", self.ciclo_abierto)
+            self.asignaciones[asignacion["id"]] = asignacion
+            self.asignaciones_por_usuario.setdefault(asignacion["id_usuario"], []).append(
+                asignacion
+            )
+
+        # (id_asignacion, id_accion, ciclo) -> selección, igual que el índice único
+        self.seleccion_por_clave: Dict[Tuple[int, int, int], dict] = {}
+        self.selecciones_por_asignacion: Dict[int, List[dict]] = {}
+        for seleccion in sorted(
+            tablas["usuario_compromiso_accion_seleccion"], key=lambda s: s["id"]
+        ):
+            self._indexar_seleccion(seleccion)
+
+        self.innovaciones_por_asignacion: Dict[int, List[dict]] = {}
+        for innovacion in sorted(tablas["usuario_accion_innovacion"], key=lambda i: i["id"]):
+            if isinstance(innovacion.get("fecha_creacion"), str):
+                innovacion["fecha_creacion"] = datetime.fromisoformat(
+                    innovacion["fecha_creacion"]
+                )
+            self.innovaciones_por_asignacion.setdefault(
+                innovacion["id_usuario_compromiso_asignacion"], []
+            ).append(innovacion)
+
+        self.auditoria_por_asignacion: Dict[int, List[dict]] = {}
+        for evento in sorted(tablas["auditoria_cambios"], key=lambda e: e["id"]):
+            self._indexar_auditoria(evento)
+
+        self._secuencia_selecciones = itertools.count(
+            max((s["id"] for s in tablas["usuario_compromiso_accion_seleccion"]), default=0) + 1
+        )
+        self._secuencia_innovaciones = itertools.count(
+            max((i["id"] for i in tablas["usuario_accion_innovacion"]), default=0) + 1
+        )
+        self._secuencia_auditoria = itertools.count(
+            max((e["id"] for e in tablas["auditoria_cambios"]), default=0) + 1
+        )
+        self._avisos_pendientes = set()
+
+    def _indexar_seleccion(self, seleccion: dict):
+        id_asignacion = seleccion["id_usuario_compromiso_asignacion"]
+        seleccion.setdefault("ciclo", self.asignaciones[id_asignacion]["ciclo"])
+        clave = (id_asignacion, seleccion["id_accion"], seleccion["ciclo"])
+        self.seleccion_por_clave[clave] = seleccion
+        self.selecciones_por_asignacion.setdefault(id_asignacion, []).append(seleccion)
+
+    def _indexar_auditoria(self, evento: dict):
+        if isinstance(evento.get("fecha"), str):
+            evento["fecha"] = datetime.fromisoformat(evento["fecha"])
+        if isinstance(evento.get("datos"), str):
+            evento["datos"] = json.loads(evento["datos"])
+        self.auditoria_por_asignacion.setdefault(
+            evento["id_usuario_compromiso_asignacion"], []
+        ).append(evento)
+
+    def _asignaciones_ciclo(self, usuario_id: int) -> List[dict]:
+        return [
+            a
+            for a in self.asignaciones_por_usuario.get(usuario_id, [])
+            if a["ciclo"] == self.ciclo_abierto
+        ]
+
+    def _asignaciones_activas(self, usuario_id: int, id_rol: Optional[int] = None) -> List[dict]:
+        return [
+            a
+            for a in self._asignaciones_ciclo(usuario_id)
+            if a["estado"] and (id_rol is None or a["id_rol"] == id_rol)
+        ]
+
+    def _sumas(self, id_asignacion: int) -> Tuple[int, float]:
+        """(total de acciones, suma de pesos) de selecciones + innovaciones"""
+        filas = self.selecciones_por_asignacion.get(
+            id_asignacion, []
+        ) + self.innovaciones_por_asignacion.get(id_asignacion, [])
+        return len(filas), sum(float(f["peso_porcentual_usuario"]) for f in filas)
+
+    def _filas_roles(self, usuario_id: int) -> Iterator[Tuple[Optional[dict], Optional[dict], Optional[dict]]]:
+        """(rol, rol_regional, rol_centro) como el LEFT JOIN de usuario con
+        usuario_rol_regional × usuario_rol_centro y roles de cualquiera de los dos"""
+        for urr in self.roles_regionales_por_usuario.get(usuario_id) or [None]:
+            for urc in self.roles_centro_por_usuario.get(usuario_id) or [None]:
+                ids = dict.fromkeys(x["id_rol"] for x in (urr, urc) if x)
+                roles = [self.roles[i] for i in ids if i in self.roles] or [None]
+                for rol in roles:
+                    yield rol, urr, urc
+
+    def _rol_principal(
+        self, usuario_id: int
+    ) -> Tuple[Optional[dict], Optional[dict], Optional[dict]]:
+        """La fila de _filas_roles con menor (rol, regional, centro), nulos al final;
+        igual que el ORDER BY ... LIMIT 1 del resumen en Postgres"""
+
+        def clave(fila):
+            rol, urr, urc = fila
+            regional = urr["id_regional"] if urr and urr["id_regional"] in self.regionales else None
+            centro = urc["id_centro"] if urc and urc["id_centro"] in self.centros else None
+            return tuple(
+                (x is None, x or 0) for x in (rol["id"] if rol else None, regional, centro)
+            )
+
+        return min(self._filas_roles(usuario_id), key=clave)
+
+    def _nombre_regional(self, urr: Optional[dict]) -> Optional[str]:
+        regional = self.regionales.get(urr["id_regional"]) if urr else None
+        return regional["nombre_regional"] if regional else None
+
+    def _nombre_centro(self, urc: Optional[dict]) -> Optional[str]:
+        centro = self.centros.get(urc["id_centro"]) if urc else None
+        return centro["nombre_centro"] if centro else None
+
+    # ============================================
+    # USUARIOS
+    # ============================================
+
+    async def obtener_usuario_por_email(self, email: str) -> Optional[Tuple[int, str, str]]:
+        usuario = self.usuarios_por_email.get(email)
+        return (usuario["id"], usuario["email"], usuario["password"]) if usuario else None
+
+    async def listar_roles_usuario(self, usuario_id: int) -> List[str]:
+        return list(
+            dict.fromkeys(rol["nombre"] for rol, _, _ in self._filas_roles(usuario_id) if rol)
+        )
+
+    async def listar_directores_subdirectores(self) -> List[dict]:
+        usuarios = [
+            {
+                "id": usuario["id"],
+                "email": usuario["email"],
+                "rol": rol["nombre"],
+                "regional": self._nombre_regional(urr),
+                "centro": self._nombre_centro(urc),
+            }
+            for usuario in self.usuarios.values()
+            for rol, urr, urc in self._filas_roles(usuario["id"])
+            if rol and rol["nombre"] in ROLES_DIRECTIVOS
+        ]
+        return sorted(usuarios, key=lambda u: (u["rol"], u["email"]))
+
+    async def contar_directores_subdirectores(self) -> Dict[str, int]:
+        usuarios_por_rol: Dict[str, set] = {}
+        for usuario_id, roles_regionales in self.roles_regionales_por_usuario.items():
+            if usuario_id not in self.usuarios:
+                continue
+            for urr in roles_regionales:
+                rol = self.roles.get(urr["id_rol"])
+                if rol and rol["nombre"] in ROLES_DIRECTIVOS:
+                    usuarios_por_rol.setdefault(rol["nombre"], set()).add(usuario_id)
+        return {nombre: len(ids) for nombre, ids in usuarios_por_rol.items()}
+
+    # ============================================
+    # ASIGNACIONES Y ACCIONES
+    # ============================================
+
+    async def listar_asignaciones_usuario(
+        self, usuario_id: int
+    ) -> List[UsuarioCompromisoAsignacionResponse]:
+        asignaciones = sorted(
+            (
+                a
+                for a in self._asignaciones_activas(usuario_id)
+                if a["id_compromiso"] in self.compromisos
+            ),
+            key=lambda a: (a["id_compromiso"], a["id"]),
+        )
+        respuesta = []
+        for a in asignaciones:
+            c = self.compromisos[a["id_compromiso"]]
+            respuesta.append(
+                UsuarioCompromisoAsignacionResponse(
+                    id=a["id"],
+                    id_usuario=a["id_usuario"],
+                    id_rol=a["id_rol"],
+                    id_regional=a.get("id_regional"),
+                    id_centro=a.get("id_centro"),
+                    id_compromiso=a["id_compromiso"],
+                    estado=a["estado"],
+                    compromiso=CompromisoResponse(
+                        id=c["id"],
+                        nombre=c["nombre"],
+                        descripcion=c.get("descripcion"),
+                        peso_porcentual=float(c["peso_porcentual"]),
+                        estado=c["estado"],
+                    ),
+                )
+            )
+        return respuesta
+
+    async def obtener_asignacion(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> Optional[int]:
+        candidatas = [
+            a
+            for a in self._asignaciones_activas(usuario_id, id_rol)
+            if a["id_compromiso"] == compromiso_id
+        ]
+        return candidatas[0]["id"] if candidatas else None
+
+    async def listar_acciones_disponibles(
+        self, id_rol: int, compromiso_id: int
+    ) -> List[AccionResponse]:
+        return [
+            _accion(a) for a in self.acciones_por_rol_compromiso.get((id_rol, compromiso_id), [])
+        ]
+
+    async def existe_accion(self, id_accion: int, id_rol: int, compromiso_id: int) -> bool:
+        accion = self.acciones.get(id_accion)
+        return bool(
+            accion
+            and accion["estado"]
+            and accion["id_rol"] == id_rol
+            and accion["id_compromiso"] == compromiso_id
+        )
+
+    async def listar_acciones_seleccionadas(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> List[AccionSeleccionResponse]:
+        filas = [
+            (s, self.acciones[s["id_accion"]])
+            for a in self._asignaciones_activas(usuario_id, id_rol)
+            if a["id_compromiso"] == compromiso_id
+            for s in self.selecciones_por_asignacion.get(a["id"], [])
+            if s["id_accion"] in self.acciones
+        ]
+        filas.sort(key=lambda fila: (not fila[1]["obligatorio"], fila[1]["id"]))
+        return [
+            AccionSeleccionResponse(
+                id=s["id"],
+                id_accion=s["id_accion"],
+                peso_porcentual_usuario=float(s["peso_porcentual_usuario"]),
+                estado=s["estado"],
+                accion=_accion(accion),
+            )
+            for s, accion in filas
+        ]
+
+    async def guardar_seleccion(
+        self, id_asignacion: int, id_accion: int, peso: float
+    ) -> Tuple[int, bool]:
+        ciclo = self.asignaciones[id_asignacion]["ciclo"]
+        existente = self.seleccion_por_clave.get((id_asignacion, id_accion, ciclo))
+        if existente:
+            existente["peso_porcentual_usuario"] = peso
+            return existente["id"], False
+
+        seleccion = {
+            "id": next(self._secuencia_selecciones),
+            "id_usuario_compromiso_asignacion": id_asignacion,
+            "id_accion": id_accion,
+            "peso_porcentual_usuario": peso,
+            "estado": True,
+            "fecha_seleccion": datetime.now(),
+            "ciclo": ciclo,
+        }
+        self._indexar_seleccion(seleccion)
+        return seleccion["id"], True
+
+    async def guardar_selecciones(self, selecciones: List[Tuple[int, int, float]]):
+        for id_asignacion, id_accion, peso in selecciones:
+            await self.guardar_seleccion(id_asignacion, id_accion, peso)
+
+    # ============================================
+    # INNOVACIONES
+    # ============================================
+
+    async def contar_innovaciones(self, id_asignacion: int) -> int:
+        return sum(
+            1 for i in self.innovaciones_por_asignacion.get(id_asignacion, []) if i["estado"]
+        )
+
+    async def crear_innovacion(
+        self, id_asignacion: int, datos: AccionInnovacionRequest
+    ) -> AccionInnovacionResponse:
+        innovacion = {
+            "id": next(self._secuencia_innovaciones),
+            "id_usuario_compromiso_asignacion": id_asignacion,
+            "nombre": datos.nombre,
+            "descripcion": datos.descripcion,
+            "peso_porcentual_usuario": datos.peso_porcentual_usuario,
+            "evidencias": datos.evidencias,
+            "estado": True,
+            "fecha_creacion": datetime.now(),
+            "ciclo": self.asignaciones[id_asignacion]["ciclo"],
+        }
+        self.innovaciones_por_asignacion.setdefault(id_asignacion, []).append(innovacion)
+        return _innovacion(innovacion)
+
+    async def listar_innovaciones(
+        self, usuario_id: int, id_rol: int
+    ) -> List[AccionInnovacionResponse]:
+        innovaciones = [
+            i
+            for a in self._asignaciones_activas(usuario_id, id_rol)
+            if a["id_compromiso"] == ID_COMPROMISO_INNOVACION
+            for i in self.innovaciones_por_asignacion.get(a["id"], [])
+        ]
+        innovaciones.sort(key=lambda i: (i["fecha_creacion"], i["id"]), reverse=True)
+        return [_innovacion(i) for i in innovaciones]
+
+    # ============================================
+    # VALIDACIÓN Y RESUMEN
+    # ============================================
+
+    def _totales_por_compromiso(self, asignaciones: List[dict]) -> Dict[int, Tuple[int, float]]:
+        totales: Dict[int, Tuple[int, float]] = {}
+        for a in asignaciones:
+            if a["id_compromiso"] not in self.compromisos:
+                continue
+            total, suma = self._sumas(a["id"])
+            total_previo, suma_previa = totales.get(a["id_compromiso"], (0, 0.0))
+            totales[a["id_compromiso"]] = (total_previo + total, suma_previa + suma)
+        return dict(sorted(totales.items()))
+
+    async def validar_pesos(
+        self, usuario_id: int, id_rol: int
+    ) -> List[ValidacionPesosResponse]:
+        totales = self._totales_por_compromiso(self._asignaciones_activas(usuario_id, id_rol))
+        return [
+            construir_validacion(
+                compromiso_id,
+                self.compromisos[compromiso_id]["nombre"],
+                float(self.compromisos[compromiso_id]["peso_porcentual"]),
+                total,
+                suma or 0,
+            )
+            for compromiso_id, (total, suma) in totales.items()
+        ]
+
+    async def obtener_resumen_usuario(
+        self, usuario_id: int
+    ) -> Optional[UsuarioResumenResponse]:
+        usuario = self.usuarios.get(usuario_id)
+        if not usuario:
+            return None
+        rol, urr, urc = self._rol_principal(usuario_id)
+
+        totales = self._totales_por_compromiso(self._asignaciones_activas(usuario_id))
+        compromisos = []
+        for compromiso_id, (_, suma_pesos) in totales.items():
+            compromiso = self.compromisos[compromiso_id]
+            # Igual que en Postgres: acciones de todas las asignaciones del compromiso
+            asignaciones = [
+                a["id"]
+                for a in self._asignaciones_ciclo(usuario_id)
+                if a["id_compromiso"] == compromiso_id
+            ]
+            acciones = [
+                AccionResumenResponse(
+                    id=s["id"],
+                    nombre=self.acciones[s["id_accion"]]["nombre"],
+                    peso_porcentual_usuario=float(s["peso_porcentual_usuario"]),
+                )
+                for id_asignacion in asignaciones
+                for s in self.selecciones_por_asignacion.get(id_asignacion, [])
+                if s["id_accion"] in self.acciones
+            ] + [
+                AccionResumenResponse(
+                    id=i["id"],
+                    nombre=i["nombre"],
+                    peso_porcentual_usuario=float(i["peso_porcentual_usuario"]),
+                )
+                for id_asignacion in asignaciones
+                for i in self.innovaciones_por_asignacion.get(id_asignacion, [])
+            ]
+            suma_pesos = suma_pesos or 0
+            compromisos.append(
+                CompromisoResumenResponse(
+                    id=compromiso_id,
+                    nombre=compromiso["nombre"],
+                    peso_porcentual=float(compromiso["peso_porcentual"]),
+                    acciones_seleccionadas=acciones,
+                    suma_pesos=suma_pesos,
+                    estado_completo=es_suma_valida(suma_pesos),
+                )
+            )
+
+        return UsuarioResumenResponse(
+            id=usuario["id"],
+            nombre=usuario["email"],
+            email=usuario["email"],
+            rol=rol["nombre"] if rol else "Sin rol",
+            regional=self._nombre_regional(urr),
+            centro=self._nombre_centro(urc),
+            compromisos=compromisos,
+        )
+
+    async def listar_usuarios_regional(self, id_regional: int) -> List[int]:
+        return sorted(
+            {
+                a["id_usuario"]
+                for a in self.asignaciones.values()
+                if a.get("id_regional") == id_regional
+                and a["estado"]
+                and a["ciclo"] == self.ciclo_abierto
+            }
+        )
+
+    def _grupo_cumplimiento(
+        self, nivel: str, usuario_id: int, id_regional: Optional[int], id_centro: Optional[int]
+    ) -> Tuple[Optional[int], Optional[str]]:
+        """(id, nombre) del grupo; sin regional o centro, (None, None) como el LEFT JOIN"""
+        if nivel == "usuario":
+            return usuario_id, self.usuarios[usuario_id]["email"]
+        if nivel == "centro":
+            centro = self.centros.get(id_centro)
+            return (centro["id"], centro["nombre_centro"]) if centro else (None, None)
+        regional = self.regionales.get(id_regional)
+        return (regional["id"], regional["nombre_regional"]) if regional else (None, None)
+
+    async def cumplimiento_por_grupo(
+        self, nivel: str, id_regional: Optional[int], id_centro: Optional[int]
+    ) -> List[CumplimientoGrupoResponse]:
+        # (id_usuario, rol, id_regional, id_centro) -> todas sus asignaciones al 100%
+        usuarios_estado: Dict[Tuple[int, str, Optional[int], Optional[int]], bool] = {}
+        for a in self.asignaciones.values():
+            rol = self.roles.get(a["id_rol"])
+            if not (
+                a["estado"]
+                and a["ciclo"] == self.ciclo_abierto
+                and rol
+                and rol["nombre"] in ROLES_DIRECTIVOS
+                and (id_regional is None or a.get("id_regional") == id_regional)
+                and (id_centro is None or a.get("id_centro") == id_centro)
+            ):
+                continue
+            clave = (a["id_usuario"], rol["nombre"], a.get("id_regional"), a.get("id_centro"))
+            completo = es_suma_valida(self._sumas(a["id"])[1])
+            usuarios_estado[clave] = usuarios_estado.get(clave, True) and completo
+
+        # grupo -> [directores, completos, subdirectores, completos]
+        conteos: Dict[Tuple[Optional[int], Optional[str]], List[int]] = {}
+        for (usuario_id, rol, regional, centro), completo in usuarios_estado.items():
+            if usuario_id not in self.usuarios:
+                continue
+            grupo = self._grupo_cumplimiento(nivel, usuario_id, regional, centro)
+            conteo = conteos.setdefault(grupo, [0, 0, 0, 0])
+            desde = 0 if rol == "Director Regional" else 2
+            conteo[desde] += 1
+            conteo[desde + 1] += completo
+
+        # ORDER BY nombre, id de Postgres: nulos al final
+        orden = sorted(
+            conteos.items(),
+            key=lambda g: (g[0][1] is None, g[0][1] or "", g[0][0] is None, g[0][0] or 0),
+        )
+        return [construir_grupo_cumplimiento(*grupo, *conteo) for grupo, conteo in orden]
+
+    # ============================================
+    # AUDITORÍA
+    # ============================================
+
+    def registrar_auditoria(self, evento: tuple):
+        """Guardar un evento de RegistroAuditoria (en Postgres va con COPY)"""
+        fecha, tabla, operacion, id_registro, id_asignacion, id_usuario_actor, datos = evento
+        self._indexar_auditoria(
+            {
+                "id": next(self._secuencia_auditoria),
+                "fecha": fecha,
+                "tabla": tabla,
+                "operacion": operacion,
+                "id_registro": id_registro,
+                "id_usuario_compromiso_asignacion": id_asignacion,
+                "id_usuario_actor": id_usuario_actor,
+                "datos": datos,
+            }
+        )
+
+    async def listar_auditoria(
+        self, id_asignacion: int, antes_de: Optional[int], limite: int
+    ) -> AuditoriaPaginaResponse:
+        eventos = [
+            e
+            for e in reversed(self.auditoria_por_asignacion.get(id_asignacion, []))
+            if antes_de is None or e["id"] < antes_de
+        ]
+        pagina = [
+            AuditoriaEventoResponse(
+                id=e["id"],
+                fecha=e["fecha"],
+                tabla=e["tabla"],
+                operacion=e["operacion"],
+                id_registro=e.get("id_registro"),
+                id_usuario_actor=e.get("id_usuario_actor"),
+                datos=e["datos"],
+            )
+            for e in eventos[:limite]
+        ]
+        return AuditoriaPaginaResponse(
+            eventos=pagina,
+            siguiente=pagina[-1].id if len(eventos) > limite else None,
+        )
+
+    # ============================================
+    # TRANSACCIÓN
+    # ============================================
+
+    async def notificar_cambio_pesos(self, usuario_id: int, id_rol: int):
+        self._avisos_pendientes.add(f"{usuario_id}:{id_rol}")
+
+    async def confirmar(self):
+        # Sin NOTIFY: se entrega directo a los suscriptores de este proceso
+        avisos, self._avisos_pendientes = self._avisos_pendientes, set()
+        for payload in avisos:
+            difusor_validaciones.publicar(payload)
+
+
+# ============================================
+# DATOS INICIALES
+# ============================================
+
+
+def cargar_datos(ruta: str) -> Dict[str, List[dict]]:
+    """Datos desde un JSON {tabla: [filas]} con las tablas de TABLAS"""
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def datos_ejemplo(usuarios: int = 100, acciones_por_compromiso: int = 5) -> Dict[str, List[dict]]:
+    """Datos sintéticos para pruebas de carga: mitad directores, mitad subdirectores,
+    cada uno con una asignación por compromiso. Contraseña de todos: "password"."""
+    ciclo = datetime.now().year
+    regionales = [{"id": n, "nombre_regional": f"Regional {n}"} for n in range(1, 11)]
+    centros = [
+        {"id": n, "nombre_centro": f"Centro {n}", "id_regional": (n - 1) % 10 + 1}
+        for n in range(1, 51)
+    ]
+    roles = [
+        {"id": 1, "nombre": "Director Regional"},
+        {"id": 2, "nombre": "Subdirector Centro"},
+        {"id": 3, "nombre": "admin"},
+    ]
+    compromisos = [
+        {"id": n, "nombre": f"Compromiso {n}", "descripcion": None,
+         "peso_porcentual": peso, "estado": True}
+        for n, peso in ((1, 40), (2, 40), (3, 20))
+    ]
+    acciones = [
+        {
+            "id": (rol - 1) * 100 + (compromiso - 1) * acciones_por_compromiso + n,
+            "id_rol": rol,
+            "id_compromiso": compromiso,
+            "nombre": f"Acción {n} del compromiso {compromiso}",
+            "descripcion": None,
+            "obligatorio": n == 1,
+            "peso_fijo": None,
+            "estado": True,
+        }
+        for rol in (1, 2)
+        for compromiso in (1, 2)
+        for n in range(1, acciones_por_compromiso + 1)
+    ]
+
+    datos = {
+        "usuarios": [{"id": 1, "email": "admin@ejemplo.com", "password": "password"}],
+        "roles": roles,
+        "regionales": regionales,
+        "centros": centros,
+        "usuario_rol_regional": [{"id_usuario": 1, "id_rol": 3, "id_regional": 1}],
+        "usuario_rol_centro": [],
+        "compromisos": compromisos,
+        "acciones": acciones,
+        "usuario_compromiso_asignacion": [],
+        "ciclos_evaluacion": [{"ciclo": ciclo, "estado": "abierto"}],
+    }
+    for n in range(2, usuarios + 2):
+        rol = 1 if n % 2 == 0 else 2
+        centro = centros[n % len(centros)]
+        datos["usuarios"].append(
+            {"id": n, "email": f"usuario{n}@ejemplo.com", "password": "password"}
+        )
+        if rol == 1:
+            datos["usuario_rol_regional"].append(
+                {"id_usuario": n, "id_rol": rol, "id_regional": centro["id_regional"]}
+            )
+        else:
+            datos["usuario_rol_centro"].append(
+                {"id_usuario": n, "id_rol": rol, "id_centro": centro["id"]}
+            )
+        for compromiso in compromisos:
+            datos["usuario_compromiso_asignacion"].append(
+                {
+                    "id": len(datos["usuario_compromiso_asignacion"]) + 1,
+                    "id_usuario": n,
+                    "id_rol": rol,
+                    "id_regional": centro["id_regional"],
+                    "id_centro": centro["id"] if rol == 2 else None,
+                    "id_compromiso": compromiso["id"],
+                    "estado": True,
+                    "ciclo": ciclo,
+                }
+            )
+    return datos
+
+
+_repositorio: Optional[RepositorioMemoria] = None
+
+
+def obtener_repositorio_memoria() -> RepositorioMemoria:
+    """Instancia del proceso, creada con settings.memoria_datos o datos de ejemplo"""
+    global _repositorio
+    if _repositorio is None:
+        datos = cargar_datos(settings.memoria_datos) if settings.memoria_datos else datos_ejemplo()
+        _repositorio = RepositorioMemoria(datos)
+    return _repositorio
@@ -0,0 +1,567 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from notificaciones import CANAL_VALIDACION
+from config import settings
+from repositorio import ID_COMPROMISO_INNOVACION, ROLES_DIRECTIVOS, Repositorio
+from schemas import (
+    AccionResponse,
+    AccionSeleccionResponse,
+    AccionInnovacionRequest,
+    AccionInnovacionResponse,
+    AuditoriaEventoResponse,
+    AuditoriaPaginaResponse,
+    CumplimientoGrupoResponse,
+    CompromisoResponse,
+    UsuarioCompromisoAsignacionResponse,
+    UsuarioResumenResponse,
+    CompromisoResumenResponse,
+    AccionResumenResponse,
+    ValidacionPesosResponse,
+)
+from validacion import (
+    JOIN_SUMAS_LATERAL,
+    construir_grupo_cumplimiento,
+    construir_validacion,
+    es_suma_valida,
+)
+
+# (id, nombre) del grupo según el nivel del dashboard de cumplimiento
+COLUMNAS_NIVEL_CUMPLIMIENTO = {
+    "regional": ("reg.id", "reg.nombre_regional"),
+    "centro": ("c.id", "c.nombre_centro"),
+    "usuario": ("u.id", "u.email"),
+}
+
+
+def _accion(row, inicio: int = 0) -> AccionResponse:
+    """AccionResponse desde (id, nombre, descripcion, obligatorio, peso_fijo, estado)"""
+    id_, nombre, descripcion, obligatorio, peso_fijo, estado = row[inicio : inicio + 6]
+    return AccionResponse(
+        id=id_,
+        nombre=nombre,
+        descripcion=descripcion,
+        obligatorio=obligatorio,
+        peso_fijo=float(peso_fijo) if peso_fijo else None,
+        estado=estado,
+    )
+
+
+def _innovacion(row) -> AccionInnovacionResponse:
+    return AccionInnovacionResponse(
+        id=row[0],
+        nombre=row[1],
+        descripcion=row[2],
+        peso_porcentual_usuario=float(row[3]),
+        evidencias=row[4],
+        estado=row[5],
+        fecha_creacion=row[6],
+    )
+
+
+class RepositorioPostgres(Repositorio):
+    """Repositorio sobre una sesión de SQLAlchemy (confirmar() = commit)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # ============================================
+    # USUARIOS
+    # ============================================
+
+    async def obtener_usuario_por_email(self, email: str) -> Optional[Tuple[int, str, str]]:
+        query = "SELECT id, email, password FROM usuarios WHERE email = :email"
+        result = await self.db.execute(text(query), {"email": email})
+        usuario = result.first()
+        return tuple(usuario) if usuario else None
+
+    async def listar_roles_usuario(self, usuario_id: int) -> List[str]:
+        query = """
+        SELECT DISTINCT r.nombre
+        FROM roles r
+        LEFT JOIN usuario_rol_regional urr ON r.id = urr.id_rol
+        LEFT JOIN usuario_rol_centro urc ON r.id = urc.id_rol
+        WHERE (urr.id_usuario = :usuario_id OR urc.id_usuario = :usuario_id)
+        """
+        result = await self.db.execute(text(query), {"usuario_id": usuario_id})
+        return [row[0] for row in result]
+
+    async def listar_directores_subdirectores(self) -> List[dict]:
+        query = """
+        SELECT
+            u.id,
+            u.email,
+            r.nombre as rol,
+            reg.nombre_regional,
+            c.nombre_centro
+        FROM usuarios u
+        LEFT JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
+        LEFT JOIN usuario_rol_centro urc ON u.id = urc.id_usuario
+        LEFT JOIN roles r ON urr.id_rol = r.id OR urc.id_rol = r.id
+        LEFT JOIN regionales reg ON urr.id_regional = reg.id
+        LEFT JOIN centros c ON urc.id_centro = c.id
+        WHERE r.nombre IN ('Director Regional', 'Subdirector Centro')
+        ORDER BY r.nombre, u.email
+        """
+        result = await self.db.execute(text(query))
+        return [
+            {
+                "id": row[0],
+                "email": row[1],
+                "rol": row[2],
+                "regional": row[3],
+                "centro": row[4],
+            }
+            for row in result
+        ]
+
+    async def contar_directores_subdirectores(self) -> Dict[str, int]:
+        query = """
+        SELECT
+            r.nombre,
+            COUNT(DISTINCT u.id) as total
+        FROM usuarios u
+        JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
+        JOIN roles r ON urr.id_rol = r.id
+        WHERE r.nombre IN ('Director Regional', 'Subdirector Centro')
+        GROUP BY r.nombre
+        """
+        result = await self.db.execute(text(query))
+        return {row[0]: row[1] for row in result}
+
+    # ============================================
+    # ASIGNACIONES Y ACCIONES
+    # ============================================
+
+    async def listar_asignaciones_usuario(
+        self, usuario_id: int
+    ) -> List[UsuarioCompromisoAsignacionResponse]:
+        query = """
+        SELECT
+            uca.id, uca.id_usuario, uca.id_rol, uca.id_regional, uca.id_centro, uca.id_compromiso, uca.estado,
+            c.id, c.nombre, c.descripcion, c.peso_porcentual, c.estado
+        FROM usuario_compromiso_asignacion uca
+        JOIN compromisos c ON uca.id_compromiso = c.id
+        WHERE uca.id_usuario = :usuario_id AND uca.estado = TRUE
+          AND uca.ciclo = (SELECT ciclo_actual())
+        ORDER BY c.id, uca.id
+        """
+        result = await self.db.execute(text(query), {"usuario_id": usuario_id})
+        return [
+            UsuarioCompromisoAsignacionResponse(
+                id=row[0],
+                id_usuario=row[1],
+                id_rol=row[2],
+                id_regional=row[3],
+                id_centro=row[4],
+                id_compromiso=row[5],
+                estado=row[6],
+                compromiso=CompromisoResponse(
+                    id=row[7],
+                    nombre=row[8],
+                    descripcion=row[9],
+                    peso_porcentual=float(row[10]),
+                    estado=row[11],
+                ),
+            )
+            for row in result
+        ]
+
+    async def obtener_asignacion(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> Optional[int]:
+        query = """
+        SELECT id FROM usuario_compromiso_asignacion
+        WHERE id_usuario = :usuario_id AND id_rol = :id_rol
+          AND id_compromiso = :compromiso_id AND estado = TRUE
+          AND ciclo = (SELECT ciclo_actual())
+        """
+        result = await self.db.execute(
+            text(query),
+            {"usuario_id": usuario_id, "id_rol": id_rol, "compromiso_id": compromiso_id},
+        )
+        return result.scalar()
+
+    async def listar_acciones_disponibles(
+        self, id_rol: int, compromiso_id: int
+    ) -> List[AccionResponse]:
+        query = """
+        SELECT a.id, a.nombre, a.descripcion, a.obligatorio, a.peso_fijo, a.estado
+        FROM acciones a
+        WHERE a.id_rol = :id_rol AND a.id_compromiso = :compromiso_id AND a.estado = TRUE
+        ORDER BY a.obligatorio DESC, a.id
+        """
+        result = await self.db.execute(
+            text(query), {"id_rol": id_rol, "compromiso_id": compromiso_id}
+        )
+        return [_accion(row) for row in result]
+
+    async def existe_accion(self, id_accion: int, id_rol: int, compromiso_id: int) -> bool:
+        query = """
+        SELECT id FROM acciones
+        WHERE id = :id_accion AND id_compromiso = :compromiso_id
+          AND id_rol = :id_rol AND estado = TRUE
+        """
+        result = await self.db.execute(
+            text(query),
+            {"id_accion": id_accion, "compromiso_id": compromiso_id, "id_rol": id_rol},
+        )
+        return result.first() is not None
+
+    async def listar_acciones_seleccionadas(
+        self, usuario_id: int, id_rol: int, compromiso_id: int
+    ) -> List[AccionSeleccionResponse]:
+        query = """
+        SELECT ucas.id, ucas.id_accion, ucas.peso_porcentual_usuario, ucas.estado,
+               a.id, a.nombre, a.descripcion, a.obligatorio, a.peso_fijo, a.estado
+        FROM usuario_compromiso_accion_seleccion ucas
+        JOIN usuario_compromiso_asignacion uca ON ucas.id_usuario_compromiso_asignacion = uca.id
+        JOIN acciones a ON ucas.id_accion = a.id
+        WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol
+          AND uca.id_compromiso = :compromiso_id AND uca.estado = TRUE
+          AND uca.ciclo = (SELECT ciclo_actual())
+        ORDER BY a.obligatorio DESC, a.id
+        """
+        result = await self.db.execute(
+            text(query),
+            {"usuario_id": usuario_id, "id_rol": id_rol, "compromiso_id": compromiso_id},
+        )
+        return [
+            AccionSeleccionResponse(
+                id=row[0],
+                id_accion=row[1],
+                peso_porcentual_usuario=float(row[2]),
+                estado=row[3],
+                accion=_accion(row, 4),
+            )
+            for row in result
+        ]
+
+    async def guardar_seleccion(
+        self, id_asignacion: int, id_accion: int, peso: float
+    ) -> Tuple[int, bool]:
+        query = """
+        INSERT INTO usuario_compromiso_accion_seleccion
+        (id_usuario_compromiso_asignacion, id_accion, peso_porcentual_usuario, estado, fecha_seleccion, ciclo)
+        VALUES (:id_asignacion, :id_accion, :peso, TRUE, CURRENT_TIMESTAMP,
+                (SELECT ciclo FROM usuario_compromiso_asignacion WHERE id = :id_asignacion))
+        ON CONFLICT (id_usuario_compromiso_asignacion, id_accion, ciclo)
+        DO UPDATE SET peso_porcentual_usuario = :peso
+        RETURNING id, (xmax = 0) AS insertado
+        """
+        result = await self.db.execute(
+            text(query),
+            {"id_asignacion": id_asignacion, "id_accion": id_accion, "peso": peso},
+        )
+        id_seleccion, insertado = result.first()
+        return id_seleccion, insertado
+
+    async def guardar_selecciones(self, selecciones: List[Tuple[int, int, float]]):
+        query = """
+        INSERT INTO usuario_compromiso_accion_seleccion
+        (id_usuario_compromiso_asignacion, id_accion, peso_porcentual_usuario, estado, fecha_seleccion, ciclo)
+        VALUES (:id_asignacion, :id_accion, :peso, TRUE, CURRENT_TIMESTAMP,
+                (SELECT ciclo FROM usuario_compromiso_asignacion WHERE id = :id_asignacion))
+        ON CONFLICT (id_usuario_compromiso_asignacion, id_accion, ciclo)
+        DO UPDATE SET peso_porcentual_usuario = EXCLUDED.peso_porcentual_usuario
+        """
+        await self.db.execute(
+            text(query),
+            [
+                {"id_asignacion": a, "id_accion": acc, "peso": peso}
+                for a, acc, peso in selecciones
+            ],
+        )
+
+    # ============================================
+    # INNOVACIONES
+    # ============================================
+
+    async def contar_innovaciones(self, id_asignacion: int) -> int:
+        query = """
+        SELECT COUNT(*) FROM usuario_accion_innovacion
+        WHERE id_usuario_compromiso_asignacion = :id_asignacion AND estado = TRUE
+        """
+        result = await self.db.execute(text(query), {"id_asignacion": id_asignacion})
+        return result.scalar() or 0
+
+    async def crear_innovacion(
+        self, id_asignacion: int, datos: AccionInnovacionRequest
+    ) -> AccionInnovacionResponse:
+        query = """
+        INSERT INTO usuario_accion_innovacion
+        (id_usuario_compromiso_asignacion, nombre, descripcion, peso_porcentual_usuario,
+         evidencias, estado, fecha_creacion, ciclo)
+        VALUES (:id_asignacion, :nombre, :descripcion, :peso, :evidencias, TRUE, CURRENT_TIMESTAMP,
+                (SELECT ciclo FROM usuario_compromiso_asignacion WHERE id = :id_asignacion))
+        RETURNING id, nombre, descripcion, peso_porcentual_usuario, evidencias, estado, fecha_creacion
+        """
+        result = await self.db.execute(
+            text(query),
+            {
+                "id_asignacion": id_asignacion,
+                "nombre": datos.nombre,
+                "descripcion": datos.descripcion,
+                "peso": datos.peso_porcentual_usuario,
+                "evidencias": datos.evidencias,
+            },
+        )
+        return _innovacion(result.first())
+
+    async def listar_innovaciones(
+        self, usuario_id: int, id_rol: int
+    ) -> List[AccionInnovacionResponse]:
+        query = """
+        SELECT uai.id, uai.nombre, uai.descripcion, uai.peso_porcentual_usuario,
+               uai.evidencias, uai.estado, uai.fecha_creacion
+        FROM usuario_accion_innovacion uai
+        JOIN usuario_compromiso_asignacion uca ON uai.id_usuario_compromiso_asignacion = uca.id
+        WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol
+          AND uca.id_compromiso = :compromiso_id AND uca.estado = TRUE
+          AND uca.ciclo = (SELECT ciclo_actual())
+        ORDER BY uai.fecha_creacion DESC, uai.id DESC
+        """
+        result = await self.db.execute(
+            text(query),
+            {
+                "usuario_id": usuario_id,
+                "id_rol": id_rol,
+                "compromiso_id": ID_COMPROMISO_INNOVACION,
+            },
+        )
+        return [_innovacion(row) for row in result]
+
+    # ============================================
+    # VALIDACIÓN Y RESUMEN
+    # ============================================
+
+    async def validar_pesos(
+        self, usuario_id: int, id_rol: int
+    ) -> List[ValidacionPesosResponse]:
+        query = f"""
+        SELECT
+            c.id, c.nombre, c.peso_porcentual,
+            SUM(COALESCE(s.total, 0) + COALESCE(i.total, 0)) as total_acciones,
+            SUM(COALESCE(s.suma, 0) + COALESCE(i.suma, 0)) as suma_pesos
+        FROM usuario_compromiso_asignacion uca
+        JOIN compromisos c ON uca.id_compromiso = c.id
+        {JOIN_SUMAS_LATERAL}
+        WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol AND uca.estado = TRUE
+          AND uca.ciclo = (SELECT ciclo_actual())
+        GROUP BY c.id, c.nombre, c.peso_porcentual
+        ORDER BY c.id
+        """
+        result = await self.db.execute(
+            text(query), {"usuario_id": usuario_id, "id_rol": id_rol}
+        )
+        return [
+            construir_validacion(
+                row[0], row[1], float(row[2]), int(row[3]), float(row[4]) if row[4] else 0
+            )
+            for row in result
+        ]
+
+    async def obtener_resumen_usuario(
+        self, usuario_id: int
+    ) -> Optional[UsuarioResumenResponse]:
+        # Obtener datos del usuario y rol (con varios roles, el de menor id;
+        # mismo criterio que RepositorioMemoria y el histórico)
+        query = """
+        SELECT u.id, u.email, u.email, r.nombre, reg.nombre_regional, c.nombre_centro
+        FROM usuarios u
+        LEFT JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
+        LEFT JOIN usuario_rol_centro urc ON u.id = urc.id_usuario
+        LEFT JOIN roles r ON urr.id_rol = r.id OR urc.id_rol = r.id
+        LEFT JOIN regionales reg ON urr.id_regional = reg.id
+        LEFT JOIN centros c ON urc.id_centro = c.id
+        WHERE u.id = :usuario_id
+        ORDER BY r.id, reg.id, c.id
+        LIMIT 1
+        """
+        result = await self.db.execute(text(query), {"usuario_id": usuario_id})
+        usuario = result.first()
+
+        if not usuario:
+            return None
+
+        # Obtener compromisos y acciones
+        query = f"""
+        SELECT
+            c.id, c.nombre, c.peso_porcentual,
+            SUM(COALESCE(s.suma, 0) + COALESCE(i.suma, 0)) as suma_pesos
+        FROM usuario_compromiso_asignacion uca
+        JOIN compromisos c ON uca.id_compromiso = c.id
+        {JOIN_SUMAS_LATERAL}
+        WHERE uca.id_usuario = :usuario_id AND uca.estado = TRUE
+          AND uca.ciclo = (SELECT ciclo_actual())
+        GROUP BY c.id, c.nombre, c.peso_porcentual
+        ORDER BY c.id
+        """
+        result = await self.db.execute(text(query), {"usuario_id": usuario_id})
+        compromisos_data = result.fetchall()
+
+        compromisos = []
+        for comp in compromisos_data:
+            compromiso_id = comp[0]
+            suma_pesos = float(comp[3]) if comp[3] else 0
+
+            # Obtener acciones seleccionadas
+            query_acciones = """
+            SELECT ucas.id, a.nombre, ucas.peso_porcentual_usuario
+            FROM usuario_compromiso_accion_seleccion ucas
+            JOIN usuario_compromiso_asignacion uca ON ucas.id_usuario_compromiso_asignacion = uca.id
+            JOIN acciones a ON ucas.id_accion = a.id
+            WHERE uca.id_usuario = :usuario_id AND uca.id_compromiso = :compromiso_id
+              AND uca.ciclo = (SELECT ciclo_actual())
+
+            UNION ALL
+
+            SELECT uai.id, uai.nombre, uai.peso_porcentual_usuario
+            FROM usuario_accion_innovacion uai
+            JOIN usuario_compromiso_asignacion uca ON uai.id_usuario_compromiso_asignacion = uca.id
+            WHERE uca.id_usuario = :usuario_id AND uca.id_compromiso = :compromiso_id
+              AND uca.ciclo = (SELECT ciclo_actual())
+            """
+            result_acciones = await self.db.execute(
+                text(query_acciones),
+                {"usuario_id": usuario_id, "compromiso_id": compromiso_id},
+            )
+
+            acciones_list = [
+                AccionResumenResponse(
+                    id=acc[0], nombre=acc[1], peso_porcentual_usuario=float(acc[2])
+                )
+                for acc in result_acciones
+            ]
+
+            compromisos.append(
+                CompromisoResumenResponse(
+                    id=compromiso_id,
+                    nombre=comp[1],
+                    peso_porcentual=float(comp[2]),
+                    acciones_seleccionadas=acciones_list,
+                    suma_pesos=suma_pesos,
+                    estado_completo=es_suma_valida(suma_pesos),
+                )
+            )
+
+        return UsuarioResumenResponse(
+            id=usuario[0],
+            nombre=usuario[1],
+            email=usuario[2],
+            rol=usuario[3] or "Sin rol",
+            regional=usuario[4],
+            centro=usuario[5],
+            compromisos=compromisos,
+        )
+
+    async def listar_usuarios_regional(self, id_regional: int) -> List[int]:
+        query = """
+        SELECT DISTINCT id_usuario FROM usuario_compromiso_asignacion
+        WHERE id_regional = :id_regional AND estado = TRUE
+          AND ciclo = (SELECT ciclo_actual())
+        ORDER BY id_usuario
+        """
+        result = await self.db.execute(text(query), {"id_regional": id_regional})
+        return [row[0] for row in result]
+
+    async def cumplimiento_por_grupo(
+        self, nivel: str, id_regional: Optional[int], id_centro: Optional[int]
+    ) -> List[CumplimientoGrupoResponse]:
+        grupo_id, grupo_nombre = COLUMNAS_NIVEL_CUMPLIMIENTO[nivel]
+        filtros = ""
+        params = {"tolerancia": settings.tolerancia_pesos, "roles": list(ROLES_DIRECTIVOS)}
+        if id_regional is not None:
+            filtros += " AND uca.id_regional = :id_regional"
+            params["id_regional"] = id_regional
+        if id_centro is not None:
+            filtros += " AND uca.id_centro = :id_centro"
+            params["id_centro"] = id_centro
+
+        # Un usuario (por rol) está completo si todas sus asignaciones suman 100%.
+        # Sumas con LATERAL: solo de las asignaciones filtradas, no de las tablas completas
+        query = f"""
+        WITH usuarios_estado AS (
+            SELECT
+                uca.id_usuario, r.nombre AS rol, uca.id_regional, uca.id_centro,
+                bool_and(
+                    ABS(COALESCE(s.suma, 0) + COALESCE(i.suma, 0) - 100) <= :tolerancia
+                ) AS completo
+            FROM usuario_compromiso_asignacion uca
+            JOIN roles r ON uca.id_rol = r.id
+            {JOIN_SUMAS_LATERAL}
+            WHERE uca.estado = TRUE AND uca.ciclo = (SELECT ciclo_actual())
+              AND r.nombre = ANY(:roles){filtros}
+            GROUP BY uca.id_usuario, r.nombre, uca.id_regional, uca.id_centro
+        )
+        SELECT
+            {grupo_id}, {grupo_nombre},
+            COUNT(*) FILTER (WHERE ue.rol = 'Director Regional'),
+            COUNT(*) FILTER (WHERE ue.rol = 'Director Regional' AND ue.completo),
+            COUNT(*) FILTER (WHERE ue.rol = 'Subdirector Centro'),
+            COUNT(*) FILTER (WHERE ue.rol = 'Subdirector Centro' AND ue.completo)
+        FROM usuarios_estado ue
+        JOIN usuarios u ON ue.id_usuario = u.id
+        LEFT JOIN regionales reg ON ue.id_regional = reg.id
+        LEFT JOIN centros c ON ue.id_centro = c.id
+        GROUP BY {grupo_id}, {grupo_nombre}
+        ORDER BY {grupo_nombre}, {grupo_id}
+        """
+        result = await self.db.execute(text(query), params)
+        return [construir_grupo_cumplimiento(*row) for row in result]
+
+    # ============================================
+    # AUDITORÍA
+    # ============================================
+
+    async def listar_auditoria(
+        self, id_asignacion: int, antes_de: Optional[int], limite: int
+    ) -> AuditoriaPaginaResponse:
+        # Dos textos en vez de ":antes_de IS NULL OR id < :antes_de": con el OR el
+        # plan genérico no puede usar id como límite del recorrido del índice
+        filtro = "" if antes_de is None else "AND id < :antes_de"
+        query = f"""
+        SELECT id, fecha, tabla, operacion, id_registro, id_usuario_actor, datos
+        FROM auditoria_cambios
+        WHERE id_usuario_compromiso_asignacion = :id_asignacion {filtro}
+        ORDER BY id DESC
+        LIMIT :limite
+        """
+        params = {"id_asignacion": id_asignacion, "limite": limite + 1}
+        if antes_de is not None:
+            params["antes_de"] = antes_de
+        result = await self.db.execute(text(query), params)
+        filas = result.fetchall()
+
+        eventos = [
+            AuditoriaEventoResponse(
+                id=row[0],
+                fecha=row[1],
+                tabla=row[2],
+                operacion=row[3],
+                id_registro=row[4],
+                id_usuario_actor=row[5],
+                datos=row[6],
+            )
+            for row in filas[:limite]
+        ]
+        return AuditoriaPaginaResponse(
+            eventos=eventos,
+            siguiente=eventos[-1].id if len(filas) > limite else None,
+        )
+
+    # ============================================
+    # TRANSACCIÓN
+    # ============================================
+
+    async def notificar_cambio_pesos(self, usuario_id: int, id_rol: int):
+        # NOTIFY es transaccional: el aviso sale solo si la transacción hace commit
+        await self.db.execute(
+            text("SELECT pg_notify(:canal, :payload)"),
+            {"canal": CANAL_VALIDACION, "payload": f"{usuario_id}:{id_rol}"},
+        )
+
+    async def confirmar(self):
+        await self.db.commit()
@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from typing import List
-
-from database import get_db
+from typing import List, Optional
+import asyncio
+import json
+
+from auditoria import registro_auditoria
+from cache import CacheTTL
+from ciclos import ErrorCiclo, abrir_ciclo, listar_ciclos
+from config import settings
+from database import (
+    abrir_repositorio,
+    abrir_repositorio_cancelable,
+    get_db,
+    get_repositorio,
+    get_repositorio_cancelable,
+)
 from auth import create_access_token, require_role
+from escritura_diferida import buffer_selecciones
+from historico import ErrorHistorico, ciclos_archivados, leer_resumen_usuario, ruta_ciclo
+from importacion import ErrorImportacion, importar_en_ciclo
+from notificaciones import difusor_validaciones
+from repositorio import ID_COMPROMISO_INNOVACION, Repositorio
+from trabajos import gestor_trabajos
+from validacion import porcentaje
 from schemas import (
-    CompromisoResponse,
     AccionResponse,
     AccionSeleccionRequest,
     AccionSeleccionResponse,
@@ -15,11 +33,15 @@ from schemas import (
     UsuarioCompromisoAsignacionResponse,
     ValidacionPesosResponse,
     EstadisticasRolesResponse,
+    CumplimientoDashboardResponse,
     UsuarioResumenResponse,
-    CompromisoResumenResponse,
-    AccionResumenResponse,
     LoginRequest,
     LoginResponse,
+    ImportacionAsignacionesResponse,
+    CicloEvaluacionResponse,
+    TrabajoReporteRequest,
+    TrabajoReporteResponse,
+    AuditoriaPaginaResponse,
 )
 
 router = APIRouter()
@@ -30,13 +52,11 @@ router = APIRouter()
 
 
 @router.post("/api/v1/auth/login", response_model=LoginResponse)
-async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(credentials: LoginRequest, repo: Repositorio = Depends(get_repositorio)):
     """Login con email y password"""
 
     # Obtener usuario
-    query = "SELECT id, email, password FROM usuarios WHERE email = :email"
-    result = await db.execute(text(query), {"email": credentials.email})
-    usuario = result.first()
+    usuario = await repo.obtener_usuario_por_email(credentials.email)
 
     if not usuario:
         raise HTTPException(status_code=401, detail="Email o contraseña incorrectos")
@@ -48,15 +68,7 @@ async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=401, detail="Email o contraseña incorrectos")
 
     # Obtener roles del usuario
-    query = """
-    SELECT DISTINCT r.nombre
-    FROM roles r
-    LEFT JOIN usuario_rol_regional urr ON r.id = urr.id_rol
-    LEFT JOIN usuario_rol_centro urc ON r.id = urc.id_rol
-    WHERE (urr.id_usuario = :usuario_id OR urc.id_usuario = :usuario_id)
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id})
-    roles = [row[0] for row in result.fetchall()] or ["usuario"]
+    roles = await repo.listar_roles_usuario(usuario_id) or ["usuario"]
 
     # Crear JWT
     token_data = {"usuario_id": usuario_id, "email": email, "roles": roles}
@@ -82,41 +94,11 @@ async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_db)):
 )
 async def get_compromisos_usuario(
     usuario_id: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Obtener todos los compromisos de un usuario (solo Director/Subdirector)"""
-    query = """
-    SELECT 
-        uca.id, uca.id_usuario, uca.id_rol, uca.id_regional, uca.id_centro, uca.id_compromiso, uca.estado,
-        c.id, c.nombre, c.descripcion, c.peso_porcentual, c.estado
-    FROM usuario_compromiso_asignacion uca
-    JOIN compromisos c ON uca.id_compromiso = c.id
-    WHERE uca.id_usuario = :usuario_id AND uca.estado = TRUE
-    ORDER BY c.id
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id})
-
-    compromisos = []
-    for row in result:
-        compromiso = CompromisoResponse(
-            id=row[7],
-            nombre=row[8],
-            descripcion=row[9],
-            peso_porcentual=float(row[10]),
-            estado=row[11],
-        )
-        asignacion = UsuarioCompromisoAsignacionResponse(
-            id=row[0],
-            id_usuario=row[1],
-            id_rol=row[2],
-            id_regional=row[3],
-            id_centro=row[4],
-            id_compromiso=row[5],
-            estado=row[6],
-            compromiso=compromiso,
-        )
-        compromisos.append(asignacion)
+    compromisos = await repo.listar_asignaciones_usuario(usuario_id)
 
     if not compromisos:
         raise HTTPException(status_code=404, detail="No se encontraron compromisos")
@@ -137,45 +119,16 @@ async def get_acciones_disponibles(
     usuario_id: int,
     id_rol: int,
     compromiso_id: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Obtener acciones disponibles (solo Director/Subdirector)"""
-    query_verificar = """
-    SELECT uca.id FROM usuario_compromiso_asignacion uca
-    WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol 
-      AND uca.id_compromiso = :compromiso_id AND uca.estado = TRUE
-    """
-    result = await db.execute(
-        text(query_verificar),
-        {"usuario_id": usuario_id, "id_rol": id_rol, "compromiso_id": compromiso_id},
-    )
-    if not result.first():
+    if await repo.obtener_asignacion(usuario_id, id_rol, compromiso_id) is None:
         raise HTTPException(
             status_code=404, detail="Usuario no tiene este rol y compromiso"
         )
 
-    query = """
-    SELECT a.id, a.nombre, a.descripcion, a.obligatorio, a.peso_fijo, a.estado
-    FROM acciones a
-    WHERE a.id_rol = :id_rol AND a.id_compromiso = :compromiso_id AND a.estado = TRUE
-    ORDER BY a.obligatorio DESC, a.id
-    """
-    result = await db.execute(
-        text(query), {"id_rol": id_rol, "compromiso_id": compromiso_id}
-    )
-
-    acciones = [
-        AccionResponse(
-            id=row[0],
-            nombre=row[1],
-            descripcion=row[2],
-            obligatorio=row[3],
-            peso_fijo=float(row[4]) if row[4] else None,
-            estado=row[5],
-        )
-        for row in result
-    ]
+    acciones = await repo.listar_acciones_disponibles(id_rol, compromiso_id)
 
     if not acciones:
         raise HTTPException(status_code=404, detail="No hay acciones disponibles")
@@ -190,45 +143,15 @@ async def get_acciones_seleccionadas(
     usuario_id: int,
     id_rol: int,
     compromiso_id: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Obtener acciones ya seleccionadas (solo Director/Subdirector)"""
-    query = """
-    SELECT ucas.id, ucas.id_accion, ucas.peso_porcentual_usuario,
-           a.id, a.nombre, a.descripcion, a.obligatorio, a.peso_fijo, a.estado, ucas.estado
-    FROM usuario_compromiso_accion_seleccion ucas
-    JOIN usuario_compromiso_asignacion uca ON ucas.id_usuario_compromiso_asignacion = uca.id
-    JOIN acciones a ON ucas.id_accion = a.id
-    WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol
-      AND uca.id_compromiso = :compromiso_id AND uca.estado = TRUE
-    ORDER BY a.obligatorio DESC, a.id
-    """
-    result = await db.execute(
-        text(query),
-        {"usuario_id": usuario_id, "id_rol": id_rol, "compromiso_id": compromiso_id},
-    )
+    if settings.escritura_diferida:
+        # Leer lo que el usuario acaba de escribir
+        await buffer_selecciones.vaciar(usuario_id, id_rol)
 
-    acciones = []
-    for row in result:
-        accion = AccionResponse(
-            id=row[3],
-            nombre=row[4],
-            descripcion=row[5],
-            obligatorio=row[6],
-            peso_fijo=float(row[7]) if row[7] else None,
-            estado=row[8],
-        )
-        accion_seleccionada = AccionSeleccionResponse(
-            id=row[0],
-            id_accion=row[1],
-            peso_porcentual_usuario=float(row[2]),
-            accion=accion,
-            estado=row[9],
-        )
-        acciones.append(accion_seleccionada)
-
-    return acciones
+    return await repo.listar_acciones_seleccionadas(usuario_id, id_rol, compromiso_id)
 
 
 @router.post(
@@ -239,58 +162,48 @@ async def seleccionar_accion(
     id_rol: int,
     compromiso_id: int,
     accion_data: AccionSeleccionRequest,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Seleccionar una acción (solo Director/Subdirector)"""
-    query = """
-    SELECT id FROM usuario_compromiso_asignacion
-    WHERE id_usuario = :usuario_id AND id_rol = :id_rol 
-      AND id_compromiso = :compromiso_id AND estado = TRUE LIMIT 1
-    """
-    result = await db.execute(
-        text(query),
-        {"usuario_id": usuario_id, "id_rol": id_rol, "compromiso_id": compromiso_id},
-    )
-    asignacion = result.first()
-    if not asignacion:
+    id_asignacion = await repo.obtener_asignacion(usuario_id, id_rol, compromiso_id)
+    if id_asignacion is None:
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
-    query = """
-    SELECT id FROM acciones 
-    WHERE id = :id_accion AND id_compromiso = :compromiso_id 
-      AND id_rol = :id_rol AND estado = TRUE
-    """
-    result = await db.execute(
-        text(query),
-        {
-            "id_accion": accion_data.id_accion,
-            "compromiso_id": compromiso_id,
-            "id_rol": id_rol,
-        },
-    )
-    if not result.first():
+    if not await repo.existe_accion(accion_data.id_accion, id_rol, compromiso_id):
         raise HTTPException(status_code=404, detail="Acción no encontrada")
 
-    query = """
-    INSERT INTO usuario_compromiso_accion_seleccion 
-    (id_usuario_compromiso_asignacion, id_accion, peso_porcentual_usuario, estado, fecha_seleccion)
-    VALUES (:id_asignacion, :id_accion, :peso, TRUE, CURRENT_TIMESTAMP)
-    ON CONFLICT (id_usuario_compromiso_asignacion, id_accion) 
-    DO UPDATE SET peso_porcentual_usuario = :peso
-    RETURNING id
-    """
-    result = await db.execute(
-        text(query),
-        {
-            "id_asignacion": asignacion[0],
+    if settings.escritura_diferida:
+        # Se guarda por lotes junto con otros cambios; el id aún no existe
+        buffer_selecciones.agregar(
+            id_asignacion,
+            accion_data.id_accion,
+            accion_data.peso_porcentual_usuario,
+            usuario_id,
+            id_rol,
+            user.get("usuario_id"),
+        )
+        return {"mensaje": "Acción seleccionada", "id": None}
+
+    id_seleccion, insertado = await repo.guardar_seleccion(
+        id_asignacion, accion_data.id_accion, accion_data.peso_porcentual_usuario
+    )
+    await repo.notificar_cambio_pesos(usuario_id, id_rol)
+    await repo.confirmar()
+
+    await registro_auditoria.registrar(
+        "usuario_compromiso_accion_seleccion",
+        "INSERT" if insertado else "UPDATE",
+        id_asignacion,
+        id_registro=id_seleccion,
+        id_usuario_actor=user.get("usuario_id"),
+        datos={
             "id_accion": accion_data.id_accion,
-            "peso": accion_data.peso_porcentual_usuario,
+            "peso_porcentual_usuario": accion_data.peso_porcentual_usuario,
         },
     )
-    await db.commit()
 
-    return {"mensaje": "Acción seleccionada", "id": result.scalar()}
+    return {"mensaje": "Acción seleccionada", "id": id_seleccion}
 
 
 # ============================================
@@ -306,72 +219,33 @@ async def crear_accion_innovacion(
     usuario_id: int,
     id_rol: int,
     accion_data: AccionInnovacionRequest,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Crear una acción de innovación (solo Director/Subdirector)"""
-    query = """
-    SELECT id FROM usuario_compromiso_asignacion
-    WHERE id_usuario = :usuario_id AND id_rol = :id_rol 
-      AND id_compromiso = 3 AND estado = TRUE LIMIT 1
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id, "id_rol": id_rol})
-    asignacion = result.first()
-    if not asignacion:
+    id_asignacion = await repo.obtener_asignacion(
+        usuario_id, id_rol, ID_COMPROMISO_INNOVACION
+    )
+    if id_asignacion is None:
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
-    query = """
-    SELECT COUNT(*) FROM usuario_accion_innovacion
-    WHERE id_usuario_compromiso_asignacion = :id_asignacion AND estado = TRUE
-    """
-    result = await db.execute(text(query), {"id_asignacion": asignacion[0]})
-    count = result.scalar() or 0
-
-    if count >= 5:
+    if await repo.contar_innovaciones(id_asignacion) >= 5:
         raise HTTPException(status_code=400, detail="Máximo 5 innovaciones permitidas")
 
-    query = """
-    INSERT INTO usuario_accion_innovacion 
-    (id_usuario_compromiso_asignacion, nombre, descripcion, peso_porcentual_usuario, 
-     evidencias, estado, fecha_creacion)
-    VALUES (:id_asignacion, :nombre, :descripcion, :peso, :evidencias, TRUE, CURRENT_TIMESTAMP)
-    RETURNING id, nombre, descripcion, peso_porcentual_usuario, evidencias, estado, fecha_creacion
-    """
-    result = await db.execute(
-        text(query),
-        {
-            "id_asignacion": asignacion[0],
-            "nombre": accion_data.nombre,
-            "descripcion": accion_data.descripcion,
-            "peso": accion_data.peso_porcentual_usuario,
-            "evidencias": accion_data.evidencias,
-        },
+    innovacion = await repo.crear_innovacion(id_asignacion, accion_data)
+    await repo.notificar_cambio_pesos(usuario_id, id_rol)
+    await repo.confirmar()
+
+    await registro_auditoria.registrar(
+        "usuario_accion_innovacion",
+        "INSERT",
+        id_asignacion,
+        id_registro=innovacion.id,
+        id_usuario_actor=user.get("usuario_id"),
+        datos=accion_data.model_dump(),
     )
-    await db.commit()
-
-    # Refetch para obtener el resultado (por async)
-    query_get = """
-    SELECT id, nombre, descripcion, peso_porcentual_usuario, evidencias, estado, fecha_creacion
-    FROM usuario_accion_innovacion
-    WHERE id_usuario_compromiso_asignacion = :id_asignacion
-    ORDER BY fecha_creacion DESC
-    LIMIT 1
-    """
-    result = await db.execute(text(query_get), {"id_asignacion": asignacion[0]})
-    row = result.first()
 
-    if not row:
-        raise HTTPException(status_code=500, detail="Error creando innovación")
-
-    return AccionInnovacionResponse(
-        id=row[0],
-        nombre=row[1],
-        descripcion=row[2],
-        peso_porcentual_usuario=float(row[3]),
-        evidencias=row[4],
-        estado=row[5],
-        fecha_creacion=row[6],
-    )
+    return innovacion
 
 
 @router.get(
@@ -381,33 +255,11 @@ async def crear_accion_innovacion(
 async def get_acciones_innovacion(
     usuario_id: int,
     id_rol: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Obtener innovaciones del usuario (solo Director/Subdirector)"""
-    query = """
-    SELECT uai.id, uai.nombre, uai.descripcion, uai.peso_porcentual_usuario,
-           uai.evidencias, uai.estado, uai.fecha_creacion
-    FROM usuario_accion_innovacion uai
-    JOIN usuario_compromiso_asignacion uca ON uai.id_usuario_compromiso_asignacion = uca.id
-    WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol
-      AND uca.id_compromiso = 3 AND uca.estado = TRUE
-    ORDER BY uai.fecha_creacion DESC
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id, "id_rol": id_rol})
-
-    return [
-        AccionInnovacionResponse(
-            id=row[0],
-            nombre=row[1],
-            descripcion=row[2],
-            peso_porcentual_usuario=float(row[3]),
-            evidencias=row[4],
-            estado=row[5],
-            fecha_creacion=row[6],
-        )
-        for row in result
-    ]
+    return await repo.listar_innovaciones(usuario_id, id_rol)
 
 
 # ============================================
@@ -422,45 +274,52 @@ async def get_acciones_innovacion(
 async def validar_pesos_usuario(
     usuario_id: int,
     id_rol: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio),
     user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
 ):
     """Validar pesos de acciones (solo Director/Subdirector)"""
-    query = """
-    SELECT 
-        c.id, c.nombre, c.peso_porcentual,
-        COUNT(CASE WHEN ucas.id IS NOT NULL OR uai.id IS NOT NULL THEN 1 END) as total_acciones,
-        COALESCE(SUM(ucas.peso_porcentual_usuario), 0) + COALESCE(SUM(uai.peso_porcentual_usuario), 0) as suma_pesos
-    FROM usuario_compromiso_asignacion uca
-    JOIN compromisos c ON uca.id_compromiso = c.id
-    LEFT JOIN usuario_compromiso_accion_seleccion ucas ON uca.id = ucas.id_usuario_compromiso_asignacion
-    LEFT JOIN usuario_accion_innovacion uai ON uca.id = uai.id_usuario_compromiso_asignacion
-    WHERE uca.id_usuario = :usuario_id AND uca.id_rol = :id_rol AND uca.estado = TRUE
-    GROUP BY c.id, c.nombre, c.peso_porcentual
-    ORDER BY c.id
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id, "id_rol": id_rol})
-
-    validaciones = []
-    for row in result:
-        suma_pesos = float(row[4]) if row[4] else 0
-        peso_real = (suma_pesos * float(row[2])) / 100
-        es_valido = suma_pesos == 100
-
-        validacion = ValidacionPesosResponse(
-            compromiso_id=row[0],
-            compromiso_nombre=row[1],
-            total_acciones=int(row[3]),
-            suma_pesos=suma_pesos,
-            peso_real_en_total=peso_real,
-            es_valido=es_valido,
-            mensaje="✓ Válido"
-            if es_valido
-            else f"✗ Deben sumar 100% (actual: {suma_pesos}%)",
-        )
-        validaciones.append(validacion)
+    if settings.escritura_diferida:
+        await buffer_selecciones.vaciar(usuario_id, id_rol)
+    return await repo.validar_pesos(usuario_id, id_rol)
+
+
+@router.get("/api/v1/usuarios/{usuario_id}/roles/{id_rol}/validar-pesos/stream")
+async def stream_validar_pesos_usuario(
+    usuario_id: int,
+    id_rol: int,
+    user: dict = Depends(require_role(["Director Regional", "Subdirector Centro"])),
+):
+    """Validación de pesos en vivo vía Server-Sent Events (solo Director/Subdirector)
 
-    return validaciones
+    Envía el estado inicial y uno nuevo cada vez que cambian las acciones del usuario.
+    """
+    # Sin sesión de la petición: el stream puede durar horas y no debe retener
+    # una conexión del pool entre eventos.
+    cola = difusor_validaciones.suscribir(usuario_id, id_rol)
+
+    async def eventos():
+        try:
+            enviar = True
+            while True:
+                if enviar:
+                    async with abrir_repositorio() as repo:
+                        validaciones = await repo.validar_pesos(usuario_id, id_rol)
+                    data = json.dumps([v.model_dump() for v in validaciones])
+                    yield f"event: validacion\ndata: {data}\n\n"
+                try:
+                    await asyncio.wait_for(cola.get(), timeout=settings.sse_latido_segundos)
+                    enviar = True
+                except asyncio.TimeoutError:
+                    enviar = False
+                    yield ": latido\n\n"
+        finally:
+            difusor_validaciones.desuscribir(usuario_id, id_rol, cola)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============================================
@@ -473,29 +332,13 @@ async def validar_pesos_usuario(
     response_model=EstadisticasRolesResponse,
 )
 async def get_estadisticas_directores(
-    db: AsyncSession = Depends(get_db), user: dict = Depends(require_role(["admin"]))
+    repo: Repositorio = Depends(get_repositorio),
+    user: dict = Depends(require_role(["admin"])),
 ):
     """Obtener total de directores y subdirectores (solo admin)"""
-    query = """
-    SELECT 
-        r.nombre,
-        COUNT(DISTINCT u.id) as total
-    FROM usuarios u
-    JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
-    JOIN roles r ON urr.id_rol = r.id
-    WHERE r.nombre IN ('Director Regional', 'Subdirector Centro')
-    GROUP BY r.nombre
-    """
-    result = await db.execute(text(query))
-
-    subdirectores = 0
-    directores = 0
-
-    for row in result:
-        if row[0] == "Subdirector Centro":
-            subdirectores = row[1]
-        elif row[0] == "Director Regional":
-            directores = row[1]
+    totales = await repo.contar_directores_subdirectores()
+    subdirectores = totales.get("Subdirector Centro", 0)
+    directores = totales.get("Director Regional", 0)
 
     return EstadisticasRolesResponse(
         subdirectores_centro=subdirectores,
@@ -504,6 +347,53 @@ async def get_estadisticas_directores(
     )
 
 
+cache_cumplimiento = CacheTTL(settings.dashboard_cache_ttl)
+
+
+@router.get(
+    "/api/v1/estadisticas/cumplimiento",
+    response_model=CumplimientoDashboardResponse,
+)
+async def get_cumplimiento_pesos(
+    request: Request,
+    id_regional: Optional[int] = None,
+    id_centro: Optional[int] = None,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Porcentaje de directores/subdirectores con pesos al 100% (solo admin)
+
+    Sin filtros agrupa por regional; con id_regional por centro; con id_centro por usuario.
+    """
+    clave = (id_regional, id_centro)
+    cacheado = cache_cumplimiento.obtener(clave)
+    if cacheado is not None:
+        return cacheado
+
+    if id_centro is not None:
+        nivel = "usuario"
+    elif id_regional is not None:
+        nivel = "centro"
+    else:
+        nivel = "regional"
+    # La sesión (y el vigilante de desconexión) solo si el cache no respondió
+    async with abrir_repositorio_cancelable(request) as repo:
+        grupos = await repo.cumplimiento_por_grupo(nivel, id_regional, id_centro)
+
+    total = sum(g.total for g in grupos)
+    completos = sum(g.completos for g in grupos)
+    dashboard = CumplimientoDashboardResponse(
+        nivel=nivel,
+        id_regional=id_regional,
+        id_centro=id_centro,
+        total=total,
+        completos=completos,
+        porcentaje_completos=porcentaje(completos, total),
+        grupos=grupos,
+    )
+    cache_cumplimiento.guardar(clave, dashboard)
+    return dashboard
+
+
 # ============================================
 # RESUMEN
 # ============================================
@@ -514,98 +404,48 @@ async def get_estadisticas_directores(
 )
 async def get_resumen_usuario(
     usuario_id: int,
-    db: AsyncSession = Depends(get_db),
+    repo: Repositorio = Depends(get_repositorio_cancelable),
     user: dict = Depends(require_role(["admin"])),
 ):
     """Obtener resumen completo del usuario con compromisos y acciones (solo admin)"""
+    resumen = await repo.obtener_resumen_usuario(usuario_id)
+    if not resumen:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return resumen
 
-    # Obtener datos del usuario y rol
-    query = """
-    SELECT u.id, u.email, u.email, r.nombre, reg.nombre_regional, c.nombre_centro
-    FROM usuarios u
-    LEFT JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
-    LEFT JOIN usuario_rol_centro urc ON u.id = urc.id_usuario
-    LEFT JOIN roles r ON urr.id_rol = r.id OR urc.id_rol = r.id
-    LEFT JOIN regionales reg ON urr.id_regional = reg.id
-    LEFT JOIN centros c ON urc.id_centro = c.id
-    WHERE u.id = :usuario_id
-    LIMIT 1
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id})
-    usuario = result.first()
 
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+# ============================================
+# HISTÓRICO (ciclos cerrados)
+# ============================================
 
-    # Obtener compromisos y acciones
-    query = """
-    SELECT 
-        c.id, c.nombre, c.peso_porcentual,
-        COALESCE(SUM(ucas.peso_porcentual_usuario), 0) + COALESCE(SUM(uai.peso_porcentual_usuario), 0) as suma_pesos
-    FROM usuario_compromiso_asignacion uca
-    JOIN compromisos c ON uca.id_compromiso = c.id
-    LEFT JOIN usuario_compromiso_accion_seleccion ucas ON uca.id = ucas.id_usuario_compromiso_asignacion
-    LEFT JOIN usuario_accion_innovacion uai ON uca.id = uai.id_usuario_compromiso_asignacion
-    WHERE uca.id_usuario = :usuario_id AND uca.estado = TRUE
-    GROUP BY c.id, c.nombre, c.peso_porcentual
-    ORDER BY c.id
-    """
-    result = await db.execute(text(query), {"usuario_id": usuario_id})
-    compromisos_data = result.fetchall()
-
-    compromisos = []
-    for comp in compromisos_data:
-        compromiso_id = comp[0]
-        suma_pesos = float(comp[3]) if comp[3] else 0
-
-        # Obtener acciones seleccionadas
-        query_acciones = """
-        SELECT ucas.id, a.nombre, ucas.peso_porcentual_usuario
-        FROM usuario_compromiso_accion_seleccion ucas
-        JOIN usuario_compromiso_asignacion uca ON ucas.id_usuario_compromiso_asignacion = uca.id
-        JOIN acciones a ON ucas.id_accion = a.id
-        WHERE uca.id_usuario = :usuario_id AND uca.id_compromiso = :compromiso_id
-        
-        UNION ALL
-        
-        SELECT uai.id, uai.nombre, uai.peso_porcentual_usuario
-        FROM usuario_accion_innovacion uai
-        JOIN usuario_compromiso_asignacion uca ON uai.id_usuario_compromiso_asignacion = uca.id
-        WHERE uca.id_usuario = :usuario_id AND uca.id_compromiso = :compromiso_id
-        """
-        result_acciones = await db.execute(
-            text(query_acciones),
-            {"usuario_id": usuario_id, "compromiso_id": compromiso_id},
-        )
-        acciones = result_acciones.fetchall()
-
-        acciones_list = [
-            AccionResumenResponse(
-                id=acc[0], nombre=acc[1], peso_porcentual_usuario=float(acc[2])
-            )
-            for acc in acciones
-        ]
-
-        compromisos.append(
-            CompromisoResumenResponse(
-                id=compromiso_id,
-                nombre=comp[1],
-                peso_porcentual=float(comp[2]),
-                acciones_seleccionadas=acciones_list,
-                suma_pesos=suma_pesos,
-                estado_completo=suma_pesos == 100,
-            )
-        )
 
-    return UsuarioResumenResponse(
-        id=usuario[0],
-        nombre=usuario[1],
-        email=usuario[2],
-        rol=usuario[3] or "Sin rol",
-        regional=usuario[4],
-        centro=usuario[5],
-        compromisos=compromisos,
-    )
+@router.get("/api/v1/historico/ciclos")
+async def get_ciclos_historicos(user: dict = Depends(require_role(["admin"]))):
+    """Ciclos cerrados archivados en Parquet (solo admin)"""
+    return {"ciclos": ciclos_archivados()}
+
+
+@router.get(
+    "/api/v1/historico/ciclos/{ciclo}/usuarios/{usuario_id}/resumen",
+    response_model=UsuarioResumenResponse,
+)
+async def get_resumen_usuario_historico(
+    ciclo: int,
+    usuario_id: int,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Resumen de un usuario en un ciclo cerrado, leído del archivo (solo admin)"""
+    if not ruta_ciclo(ciclo).exists():
+        raise HTTPException(status_code=404, detail=f"El ciclo {ciclo} no está archivado")
+
+    try:
+        resumen = await asyncio.to_thread(leer_resumen_usuario, ciclo, usuario_id)
+    except ErrorHistorico as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if not resumen:
+        raise HTTPException(status_code=404, detail="Usuario sin asignaciones en el ciclo")
+    return resumen
 
 
 # ============================================
@@ -615,43 +455,184 @@ async def get_resumen_usuario(
 
 @router.get("/api/v1/usuarios/perfiles/directores-subdirectores")
 async def get_usuarios_directores_subdirectores(
-    db: AsyncSession = Depends(get_db), user: dict = Depends(require_role(["admin"]))
+    repo: Repositorio = Depends(get_repositorio_cancelable),
+    user: dict = Depends(require_role(["admin"])),
 ):
     """Obtener todos los usuarios con perfil de Director Regional o Subdirector Centro (solo admin)"""
-    query = """
-    SELECT 
-        u.id,
-        u.email,
-        r.nombre as rol,
-        reg.nombre_regional,
-        c.nombre_centro
-    FROM usuarios u
-    LEFT JOIN usuario_rol_regional urr ON u.id = urr.id_usuario
-    LEFT JOIN usuario_rol_centro urc ON u.id = urc.id_usuario
-    LEFT JOIN roles r ON urr.id_rol = r.id OR urc.id_rol = r.id
-    LEFT JOIN regionales reg ON urr.id_regional = reg.id
-    LEFT JOIN centros c ON urc.id_centro = c.id
-    WHERE r.nombre IN ('Director Regional', 'Subdirector Centro')
-    ORDER BY r.nombre, u.email
-    """
-    result = await db.execute(text(query))
-    usuarios = result.fetchall()
+    usuarios = await repo.listar_directores_subdirectores()
 
     if not usuarios:
         raise HTTPException(
             status_code=404, detail="No se encontraron usuarios con estos perfiles"
         )
 
-    return {
-        "total": len(usuarios),
-        "usuarios": [
-            {
-                "id": row[0],
-                "email": row[1],
-                "rol": row[2],
-                "regional": row[3],
-                "centro": row[4],
-            }
-            for row in usuarios
-        ],
-    }
+    return {"total": len(usuarios), "usuarios": usuarios}
+
+
+# ============================================
+# IMPORTACIÓN MASIVA
+# ============================================
+
+
+@router.post(
+    "/api/v1/admin/asignaciones/importar",
+    response_model=ImportacionAsignacionesResponse,
+)
+async def importar_asignaciones_csv(
+    request: Request,
+    ciclo: Optional[int] = Query(None, description="Ciclo destino; por defecto el abierto"),
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Importar asignaciones desde CSV en el cuerpo de la petición (solo admin)
+
+    Columnas: id_usuario,id_rol,id_regional,id_centro,id_compromiso (con encabezado).
+    Las filas válidas se guardan en una sola transacción; las inválidas se reportan.
+    Con `ciclo` posterior al abierto se cargan en preparación, antes de abrirlo.
+    """
+    try:
+        resultado = await importar_en_ciclo(db, request.stream(), ciclo)
+    except ErrorCiclo as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except ErrorImportacion as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"CSV inválido: {e}")
+
+    await db.commit()
+    return resultado
+
+
+# ============================================
+# CICLOS DE EVALUACIÓN
+# ============================================
+
+
+@router.get("/api/v1/admin/ciclos", response_model=List[CicloEvaluacionResponse])
+async def get_ciclos(
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Ciclos de evaluación y su estado (solo admin)"""
+    return await listar_ciclos(db)
+
+
+@router.post("/api/v1/admin/ciclos/{ciclo}/abrir", response_model=CicloEvaluacionResponse)
+async def post_abrir_ciclo(
+    ciclo: int,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Abrir un ciclo nuevo y cerrar el abierto (solo admin)
+
+    Desde aquí la API lee el ciclo nuevo; el cerrado queda para el archivo histórico.
+    """
+    try:
+        resultado = await abrir_ciclo(db, ciclo)
+    except ErrorCiclo as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+
+    await db.commit()
+    cache_cumplimiento.limpiar()
+    return resultado
+
+
+# ============================================
+# REPORTES EN SEGUNDO PLANO
+# ============================================
+
+
+async def _obtener_trabajo(trabajo_id: int) -> TrabajoReporteResponse:
+    trabajo = await gestor_trabajos.obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return TrabajoReporteResponse(**trabajo)
+
+
+@router.post(
+    "/api/v1/admin/reportes", response_model=TrabajoReporteResponse, status_code=202
+)
+async def crear_trabajo_reporte(
+    trabajo_data: TrabajoReporteRequest,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Encolar un reporte pesado para generarlo en segundo plano (solo admin)"""
+    try:
+        trabajo_id = await gestor_trabajos.enviar(
+            trabajo_data.tipo, trabajo_data.parametros, user.get("usuario_id")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await _obtener_trabajo(trabajo_id)
+
+
+@router.get("/api/v1/admin/reportes/{trabajo_id}", response_model=TrabajoReporteResponse)
+async def get_trabajo_reporte(
+    trabajo_id: int,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Consultar el estado de un reporte (solo admin)"""
+    return await _obtener_trabajo(trabajo_id)
+
+
+@router.get("/api/v1/admin/reportes/{trabajo_id}/descarga")
+async def descargar_trabajo_reporte(
+    trabajo_id: int,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Descargar el resultado de un reporte completado (solo admin)"""
+    row = await gestor_trabajos.obtener_resultado(trabajo_id)
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if row[0] != "completado":
+        raise HTTPException(
+            status_code=409, detail=f"El reporte no está listo (estado: {row[0]})"
+        )
+
+    return JSONResponse(
+        content=row[2],
+        headers={
+            "Content-Disposition": f'attachment; filename="{row[1]}_{trabajo_id}.json"'
+        },
+    )
+
+
+@router.delete("/api/v1/admin/reportes/{trabajo_id}", response_model=TrabajoReporteResponse)
+async def cancelar_trabajo_reporte(
+    trabajo_id: int,
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Cancelar un reporte pendiente o en ejecución (solo admin)"""
+    trabajo = await _obtener_trabajo(trabajo_id)
+    if not await gestor_trabajos.cancelar(trabajo_id):
+        raise HTTPException(
+            status_code=409, detail=f"El reporte ya terminó (estado: {trabajo.estado})"
+        )
+
+    return await _obtener_trabajo(trabajo_id)
+
+
+# ============================================
+# AUDITORÍA
+# ============================================
+
+
+@router.get(
+    "/api/v1/asignaciones/{id_asignacion}/auditoria",
+    response_model=AuditoriaPaginaResponse,
+)
+async def get_auditoria_asignacion(
+    id_asignacion: int,
+    antes_de: Optional[int] = None,
+    limite: int = Query(50, ge=1, le=500),
+    repo: Repositorio = Depends(get_repositorio),
+    user: dict = Depends(require_role(["admin"])),
+):
+    """Historial de cambios de una asignación, del más reciente al más antiguo (solo admin)
+
+    Para la página siguiente se envía antes_de con el valor de `siguiente`.
+    """
+    return await repo.listar_auditoria(id_asignacion, antes_de, limite)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 
@@ -113,6 +113,28 @@ class EstadisticasRolesResponse(BaseModel):
     total: int
 
 
+class CumplimientoGrupoResponse(BaseModel):
+    id: Optional[int]
+    nombre: Optional[str]
+    total_directores: int
+    directores_completos: int
+    total_subdirectores: int
+    subdirectores_completos: int
+    total: int
+    completos: int
+    porcentaje_completos: float
+
+
+class CumplimientoDashboardResponse(BaseModel):
+    nivel: str  # regional | centro | usuario
+    id_regional: Optional[int]
+    id_centro: Optional[int]
+    total: int
+    completos: int
+    porcentaje_completos: float
+    grupos: List[CumplimientoGrupoResponse]
+
+
 # ============================================
 # AUTENTICACIÓN
 # ============================================
@@ -164,3 +186,67 @@ class UsuarioResumenResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# ============================================
+# IMPORTACIÓN DE ASIGNACIONES
+# ============================================
+class ImportacionErrorResponse(BaseModel):
+    fila: int
+    error: str
+
+
+class ImportacionAsignacionesResponse(BaseModel):
+    ciclo: int
+    total_filas: int
+    insertadas: int
+    actualizadas: int
+    total_errores: int
+    errores: List[ImportacionErrorResponse]
+
+
+# ============================================
+# CICLOS DE EVALUACIÓN
+# ============================================
+class CicloEvaluacionResponse(BaseModel):
+    ciclo: int
+    estado: str  # preparacion | abierto | cerrado
+    fecha_apertura: Optional[datetime]
+    fecha_cierre: Optional[datetime]
+
+
+# ============================================
+# TRABAJOS DE REPORTE
+# ============================================
+class TrabajoReporteRequest(BaseModel):
+    tipo: str  # p. ej. "resumenes_regional"
+    parametros: Dict[str, Any] = {}
+
+
+class TrabajoReporteResponse(BaseModel):
+    id: int
+    tipo: str
+    parametros: Dict[str, Any]
+    estado: str
+    error: Optional[str]
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime]
+    fecha_fin: Optional[datetime]
+
+
+# ============================================
+# AUDITORÍA
+# ============================================
+class AuditoriaEventoResponse(BaseModel):
+    id: int
+    fecha: datetime
+    tabla: str
+    operacion: str
+    id_registro: Optional[int]
+    id_usuario_actor: Optional[int]
+    datos: Dict[str, Any]
+
+
+class AuditoriaPaginaResponse(BaseModel):
+    eventos: List[AuditoriaEventoResponse]
+    siguiente: Optional[int]  # valor para antes_de en la página siguiente
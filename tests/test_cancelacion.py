@@ -0,0 +1,106 @@
+"""Cancelación de consultas cuando el cliente se desconecta (get_db_cancelable).
+
+Necesita Postgres: se ejecuta solo con DATABASE_URL definida.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+psycopg = pytest.importorskip("psycopg")
+
+if not os.environ.get("DATABASE_URL"):
+    pytest.skip("Sin DATABASE_URL", allow_module_level=True)
+
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from config import settings  # noqa: E402
+from database import engine, get_db_cancelable  # noqa: E402
+
+SEGUNDOS_CONSULTA = 30
+SEGUNDOS_HASTA_DESCONEXION = 1.0
+
+app = FastAPI()
+
+
+@app.get("/lenta")
+async def consulta_lenta(db: AsyncSession = Depends(get_db_cancelable)):
+    await db.execute(text(f"SELECT pg_sleep({SEGUNDOS_CONSULTA})"))
+    return {"status": "terminada"}
+
+
+async def _pedir_y_desconectar(ruta: str) -> list:
+    """Llamar a la app ASGI y desconectar al cliente pasado un segundo"""
+    limite = time.monotonic() + SEGUNDOS_HASTA_DESCONEXION
+    primera = True
+    enviados = []
+
+    async def receive():
+        nonlocal primera
+        if primera:
+            primera = False
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # is_disconnected() llama con un scope ya cancelado: antes del límite
+        # la espera se interrumpe y la petición sigue "conectada"
+        espera = limite - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return {"type": "http.disconnect"}
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": ruta,
+        "raw_path": ruta.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return enviados
+
+
+async def _consultas_activas() -> int:
+    async with await psycopg.AsyncConnection.connect(settings.url_psycopg()) as conn:
+        cur = await conn.execute(
+            """
+            SELECT count(*) FROM pg_stat_activity
+            WHERE pid <> pg_backend_pid() AND state = 'active'
+              AND query LIKE %s
+            """,
+            (f"%pg_sleep({SEGUNDOS_CONSULTA})%",),
+        )
+        return (await cur.fetchone())[0]
+
+
+def test_desconexion_cancela_consulta_y_libera_conexion():
+    async def probar():
+        try:
+            inicio = time.monotonic()
+            enviados = await _pedir_y_desconectar("/lenta")
+            duracion = time.monotonic() - inicio
+
+            # Terminó por la cancelación, no por pg_sleep
+            assert duracion < SEGUNDOS_CONSULTA / 2
+            assert enviados[0]["type"] == "http.response.start"
+            assert enviados[0]["status"] == 499
+
+            assert await _consultas_activas() == 0
+            assert engine.pool.checkedout() == 0
+        finally:
+            await engine.dispose()
+
+    asyncio.run(probar())
@@ -0,0 +1,181 @@
+"""BufferSelecciones sobre RepositorioMemoria: agrupación, devolución al
+buffer y reintento fila por fila."""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg")
+
+from sqlalchemy.exc import IntegrityError, OperationalError  # noqa: E402
+
+import escritura_diferida  # noqa: E402
+import repositorio_memoria  # noqa: E402
+from config import settings  # noqa: E402
+from escritura_diferida import BufferSelecciones  # noqa: E402
+from repositorio_memoria import RepositorioMemoria, datos_ejemplo  # noqa: E402
+
+USUARIO = 3
+ROL = 2
+ACCION = 101
+OTRA_ACCION = 102
+ASIGNACION_INEXISTENTE = 9999
+ASIGNACION_SIN_CONEXION = 8888
+
+
+class RepositorioConRestricciones(RepositorioMemoria):
+    """Como Postgres: una asignación inexistente viola la clave foránea y
+    ASIGNACION_SIN_CONEXION simula que la base dejó de responder"""
+
+    async def guardar_seleccion(self, id_asignacion, id_accion, peso):
+        if id_asignacion == ASIGNACION_SIN_CONEXION:
+            raise OperationalError("INSERT", {}, Exception("sin conexión"))
+        if id_asignacion not in self.asignaciones:
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        return await super().guardar_seleccion(id_asignacion, id_accion, peso)
+
+
+@pytest.fixture
+def correr():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    repo = RepositorioConRestricciones(datos_ejemplo(usuarios=10, acciones_por_compromiso=3))
+
+    @asynccontextmanager
+    async def abrir_repositorio():
+        yield repo
+
+    monkeypatch.setattr(escritura_diferida, "abrir_repositorio", abrir_repositorio)
+    # La auditoría en modo memoria queda en el repositorio del proceso
+    monkeypatch.setattr(settings, "backend_datos", "memoria")
+    monkeypatch.setattr(repositorio_memoria, "_repositorio", repo)
+    return repo
+
+
+@pytest.fixture
+def buffer():
+    return BufferSelecciones(ventana_segundos=60)
+
+
+def _asignacion(repo, compromiso: int) -> int:
+    return next(
+        a["id"]
+        for a in repo.asignaciones_por_usuario[USUARIO]
+        if a["id_compromiso"] == compromiso
+    )
+
+
+def _peso(repo, id_asignacion: int, id_accion: int):
+    seleccion = repo.seleccion_por_clave.get(
+        (id_asignacion, id_accion, repo.asignaciones[id_asignacion]["ciclo"])
+    )
+    return seleccion and seleccion["peso_porcentual_usuario"]
+
+
+def _auditados(repo, id_asignacion: int):
+    return [e["datos"] for e in repo.auditoria_por_asignacion.get(id_asignacion, [])]
+
+
+def test_agrupa_y_gana_la_ultima_escritura(repo, buffer, correr):
+    asignacion = _asignacion(repo, 1)
+    for peso in (10, 20, 30):
+        buffer.agregar(asignacion, ACCION, peso, USUARIO, ROL)
+    buffer.agregar(asignacion, OTRA_ACCION, 70, USUARIO, ROL)
+
+    correr(buffer.vaciar())
+
+    assert _peso(repo, asignacion, ACCION) == 30
+    assert _peso(repo, asignacion, OTRA_ACCION) == 70
+    assert len(repo.selecciones_por_asignacion[asignacion]) == 2
+    # Un evento de auditoría por acción, con el peso guardado
+    assert _auditados(repo, asignacion) == [
+        {"id_accion": ACCION, "peso_porcentual_usuario": 30},
+        {"id_accion": OTRA_ACCION, "peso_porcentual_usuario": 70},
+    ]
+    assert buffer._pendientes == {}
+
+
+def test_vaciar_solo_un_usuario_y_rol(repo, buffer, correr):
+    asignacion = _asignacion(repo, 1)
+    buffer.agregar(asignacion, ACCION, 40, USUARIO, ROL)
+    buffer.agregar(asignacion, OTRA_ACCION, 60, USUARIO + 2, ROL)
+
+    correr(buffer.vaciar(USUARIO, ROL))
+
+    assert _peso(repo, asignacion, ACCION) == 40
+    assert _peso(repo, asignacion, OTRA_ACCION) is None
+    assert list(buffer._pendientes) == [(asignacion, OTRA_ACCION)]
+
+
+def test_devolver_no_pisa_escrituras_nuevas(buffer):
+    buffer.agregar(1, ACCION, 50, USUARIO, ROL)
+
+    buffer._devolver(
+        {(1, ACCION): (20, USUARIO, ROL, None), (1, OTRA_ACCION): (80, USUARIO, ROL, None)}
+    )
+
+    assert buffer._pendientes == {
+        (1, ACCION): (50, USUARIO, ROL, None),
+        (1, OTRA_ACCION): (80, USUARIO, ROL, None),
+    }
+
+
+def test_cancelacion_devuelve_el_lote(repo, buffer, correr, monkeypatch):
+    asignacion = _asignacion(repo, 1)
+    buffer.agregar(asignacion, ACCION, 25, USUARIO, ROL)
+
+    async def cancelado(lote):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(buffer, "_guardar", cancelado)
+    with pytest.raises(asyncio.CancelledError):
+        correr(buffer.vaciar())
+
+    assert buffer._pendientes == {(asignacion, ACCION): (25, USUARIO, ROL, None)}
+    assert _auditados(repo, asignacion) == []
+
+
+def test_fila_rechazada_se_descarta_y_el_resto_se_guarda(repo, buffer, correr, caplog):
+    asignacion = _asignacion(repo, 1)
+    buffer.agregar(asignacion, ACCION, 60, USUARIO, ROL)
+    buffer.agregar(ASIGNACION_INEXISTENTE, ACCION, 15, USUARIO, ROL)
+    buffer.agregar(asignacion, OTRA_ACCION, 40, USUARIO, ROL)
+
+    with caplog.at_level(logging.ERROR, logger="escritura_diferida"):
+        correr(buffer.vaciar())
+
+    assert (_peso(repo, asignacion, ACCION), _peso(repo, asignacion, OTRA_ACCION)) == (60, 40)
+    assert buffer._pendientes == {}
+    # La rechazada queda en el log con sus datos y no se audita
+    descartadas = [r.getMessage() for r in caplog.records if "descartada" in r.getMessage()]
+    assert len(descartadas) == 1
+    assert f"asignacion={ASIGNACION_INEXISTENTE}" in descartadas[0]
+    assert "peso=15" in descartadas[0]
+    assert len(_auditados(repo, asignacion)) == 2
+    assert _auditados(repo, ASIGNACION_INEXISTENTE) == []
+
+
+def test_sin_conexion_devuelve_lo_que_falta(repo, buffer, correr):
+    asignacion = _asignacion(repo, 1)
+    buffer.agregar(asignacion, ACCION, 60, USUARIO, ROL)
+    buffer.agregar(ASIGNACION_SIN_CONEXION, ACCION, 15, USUARIO, ROL)
+    buffer.agregar(asignacion, OTRA_ACCION, 40, USUARIO, ROL)
+
+    with pytest.raises(OperationalError):
+        correr(buffer.vaciar())
+
+    # Lo guardado antes del error se audita; lo demás vuelve al buffer
+    assert _peso(repo, asignacion, ACCION) == 60
+    assert _auditados(repo, asignacion) == [{"id_accion": ACCION, "peso_porcentual_usuario": 60}]
+    assert set(buffer._pendientes) == {
+        (ASIGNACION_SIN_CONEXION, ACCION),
+        (asignacion, OTRA_ACCION),
+    }
@@ -0,0 +1,32 @@
+"""Validación de parámetros de reportes al encolar (400 antes de crear el trabajo)."""
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg")
+
+from reportes import validar_parametros  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "parametros, esperado",
+    [({"id_regional": 3}, {"id_regional": 3}), ({"id_regional": "3"}, {"id_regional": 3})],
+)
+def test_parametros_validos(parametros, esperado):
+    assert validar_parametros("resumenes_regional", parametros) == esperado
+
+
+@pytest.mark.parametrize(
+    "parametros, mensaje",
+    [
+        ({}, "requiere el parámetro id_regional"),
+        ({"id_regional": None}, "requiere el parámetro id_regional"),
+        ({"id_regional": "norte"}, "debe ser int"),
+        ({"id_regional": True}, "debe ser int"),
+        ({"id_regional": 1.5}, "debe ser int"),
+        ({"id_regional": 1, "id_centro": 2}, "desconocidos"),
+    ],
+)
+def test_parametros_invalidos(parametros, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        validar_parametros("resumenes_regional", parametros)
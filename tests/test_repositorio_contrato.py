@@ -0,0 +1,516 @@
+"""Contrato de Repositorio: las dos implementaciones responden lo mismo.
+
+Cada prueba corre contra RepositorioMemoria y, si hay DATABASE_URL, contra
+RepositorioPostgres sobre tablas temporales con los mismos datos (todo se
+descarta con rollback al terminar).
+"""
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg")
+
+from schemas import AccionInnovacionRequest  # noqa: E402
+from repositorio_memoria import (  # noqa: E402
+    TABLAS,
+    RepositorioMemoria,
+    datos_ejemplo,
+)
+
+# Usuarios de datos_ejemplo: los pares son directores (rol 1, regional) y los
+# impares subdirectores (rol 2, centro); cada uno con una asignación por compromiso
+DIRECTOR = 2
+SUBDIRECTOR = 3
+ROL_DIRECTOR = 1
+ROL_SUBDIRECTOR = 2
+ACCIONES_POR_COMPROMISO = 3
+# Acciones del subdirector: compromiso 1 -> 101..103 (101 obligatoria), compromiso 2 -> 104..106
+ACCION_OBLIGATORIA = 101
+ACCION_OPCIONAL = 102
+ACCION_COMPROMISO_2 = 104
+ID_ANTERIOR = 1000
+ID_SIGUIENTE = 1001
+
+# Mismas columnas que leen las consultas de RepositorioPostgres
+TABLAS_TEMPORALES = [
+    "CREATE TEMP TABLE usuarios (id BIGINT PRIMARY KEY, email TEXT, password TEXT)",
+    "CREATE TEMP TABLE roles (id BIGINT PRIMARY KEY, nombre TEXT)",
+    "CREATE TEMP TABLE regionales (id BIGINT PRIMARY KEY, nombre_regional TEXT)",
+    """CREATE TEMP TABLE centros (
+        id BIGINT PRIMARY KEY, nombre_centro TEXT, id_regional BIGINT)""",
+    """CREATE TEMP TABLE usuario_rol_regional (
+        id_usuario BIGINT, id_rol BIGINT, id_regional BIGINT)""",
+    "CREATE TEMP TABLE usuario_rol_centro (id_usuario BIGINT, id_rol BIGINT, id_centro BIGINT)",
+    """CREATE TEMP TABLE compromisos (
+        id BIGINT PRIMARY KEY, nombre TEXT, descripcion TEXT,
+        peso_porcentual NUMERIC(5, 2), estado BOOLEAN)""",
+    """CREATE TEMP TABLE acciones (
+        id BIGINT PRIMARY KEY, id_rol BIGINT, id_compromiso BIGINT, nombre TEXT,
+        descripcion TEXT, obligatorio BOOLEAN, peso_fijo NUMERIC(5, 2), estado BOOLEAN)""",
+    """CREATE TEMP TABLE usuario_compromiso_asignacion (
+        id BIGINT PRIMARY KEY, id_usuario BIGINT, id_rol BIGINT, id_regional BIGINT,
+        id_centro BIGINT, id_compromiso BIGINT, estado BOOLEAN,
+        ciclo INTEGER NOT NULL DEFAULT ciclo_actual())""",
+    """CREATE TEMP TABLE usuario_compromiso_accion_seleccion (
+        id BIGSERIAL PRIMARY KEY, id_usuario_compromiso_asignacion BIGINT, id_accion BIGINT,
+        peso_porcentual_usuario NUMERIC(5, 2), estado BOOLEAN, fecha_seleccion TIMESTAMP,
+        ciclo INTEGER NOT NULL DEFAULT ciclo_actual(),
+        UNIQUE (id_usuario_compromiso_asignacion, id_accion, ciclo))""",
+    """CREATE TEMP TABLE usuario_accion_innovacion (
+        id BIGSERIAL PRIMARY KEY, id_usuario_compromiso_asignacion BIGINT, nombre TEXT,
+        descripcion TEXT, peso_porcentual_usuario NUMERIC(5, 2), evidencias TEXT,
+        estado BOOLEAN, fecha_creacion TIMESTAMP,
+        ciclo INTEGER NOT NULL DEFAULT ciclo_actual())""",
+    # ciclo_actual() resuelve ciclos_evaluacion al ejecutarse: lee esta tabla temporal
+    """CREATE TEMP TABLE ciclos_evaluacion (
+        ciclo INTEGER PRIMARY KEY, estado TEXT NOT NULL,
+        fecha_apertura TIMESTAMP, fecha_cierre TIMESTAMP)""",
+    """CREATE TEMP TABLE auditoria_cambios (
+        id BIGSERIAL PRIMARY KEY, fecha TIMESTAMP, tabla TEXT, operacion TEXT,
+        id_registro BIGINT, id_usuario_compromiso_asignacion BIGINT, id_usuario_actor BIGINT,
+        datos JSONB)""",
+]
+
+
+def _ciclo_abierto(datos: dict) -> int:
+    return next(c["ciclo"] for c in datos["ciclos_evaluacion"] if c["estado"] == "abierto")
+
+
+def _datos() -> dict:
+    datos = datos_ejemplo(usuarios=10, acciones_por_compromiso=ACCIONES_POR_COMPROMISO)
+    anterior = _ciclo_abierto(datos) - 1
+    siguiente = _ciclo_abierto(datos) + 1
+
+    # El director también tiene un rol de centro: el resumen debe elegir el mismo rol
+    datos["usuario_rol_centro"].append(
+        {"id_usuario": DIRECTOR, "id_rol": ROL_SUBDIRECTOR, "id_centro": 5}
+    )
+
+    # Asignación y selección del ciclo anterior: ninguna lectura debe verlas
+    actual = next(
+        a
+        for a in datos["usuario_compromiso_asignacion"]
+        if a["id_usuario"] == SUBDIRECTOR and a["id_compromiso"] == 1
+    )
+    datos["usuario_compromiso_asignacion"].append(
+        dict(actual, id=ID_ANTERIOR, ciclo=anterior)
+    )
+    # Ciclo siguiente ya importado pero en preparación: tampoco se lee hasta abrirlo
+    datos["usuario_compromiso_asignacion"].append(
+        dict(actual, id=ID_SIGUIENTE, ciclo=siguiente)
+    )
+    # Historial de la asignación (eventos 1..5) y un evento de otra asignación
+    datos["auditoria_cambios"] = [
+        {
+            "id": n,
+            "fecha": datetime(anterior + 1, 1, n),
+            "tabla": "usuario_compromiso_accion_seleccion",
+            "operacion": "UPDATE",
+            "id_registro": n,
+            "id_usuario_compromiso_asignacion": actual["id"] if n <= 5 else actual["id"] + 1,
+            "id_usuario_actor": SUBDIRECTOR,
+            "datos": json.dumps({"peso_porcentual_usuario": n * 10}),
+        }
+        for n in range(1, 7)
+    ]
+    datos["ciclos_evaluacion"] += [
+        {"ciclo": anterior, "estado": "cerrado"},
+        {"ciclo": siguiente, "estado": "preparacion"},
+    ]
+    datos["usuario_compromiso_accion_seleccion"] = [
+        {
+            "id": ID_ANTERIOR,
+            "id_usuario_compromiso_asignacion": ID_ANTERIOR,
+            "id_accion": ACCION_OPCIONAL,
+            "peso_porcentual_usuario": 50,
+            "estado": True,
+            "fecha_seleccion": datetime(anterior, 6, 1),
+            "ciclo": anterior,
+        }
+    ]
+    return datos
+
+
+async def _abrir_postgres(datos: dict):
+    """Sesión sobre tablas temporales; confirmar() solo libera un savepoint"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from config import settings
+
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    conn = await engine.connect()
+    transaccion = await conn.begin()
+
+    async def cerrar():
+        await sesion.close()
+        await transaccion.rollback()
+        await conn.close()
+        await engine.dispose()
+
+    sesion = None
+    try:
+        existe = await conn.execute(text("SELECT to_regclass('ciclos_evaluacion')"))
+        if existe.scalar() is None:
+            pytest.skip("Falta ciclos_evaluacion (ejecutar: python migraciones.py)")
+
+        for ddl in TABLAS_TEMPORALES:
+            await conn.execute(text(ddl))
+        for tabla in TABLAS:
+            filas = datos.get(tabla)
+            if not filas:
+                continue
+            columnas = list(filas[0])
+            await conn.execute(
+                text(
+                    f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+                    f"VALUES ({', '.join(':' + c for c in columnas)})"
+                ),
+                filas,
+            )
+        for tabla in ("usuario_compromiso_accion_seleccion", "usuario_accion_innovacion"):
+            # Como RepositorioMemoria: los ids nuevos siguen al mayor cargado
+            await conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                    f"COALESCE(MAX(id), 0) + 1, false) FROM {tabla}"
+                )
+            )
+
+        sesion = AsyncSession(
+            bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False
+        )
+    except BaseException:
+        await transaccion.rollback()
+        await conn.close()
+        await engine.dispose()
+        raise
+    return sesion, cerrar
+
+
+@pytest.fixture
+def correr():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(params=["memoria", "postgres"])
+def datos_y_repo(request, correr):
+    datos = _datos()
+    if request.param == "memoria":
+        yield datos, RepositorioMemoria(_datos())
+        return
+
+    if not os.environ.get("DATABASE_URL"):
+        pytest.skip("Sin DATABASE_URL")
+    from repositorio_postgres import RepositorioPostgres
+
+    sesion, cerrar = correr(_abrir_postgres(_datos()))
+    try:
+        yield datos, RepositorioPostgres(sesion)
+    finally:
+        correr(cerrar())
+
+
+@pytest.fixture
+def repo(datos_y_repo):
+    return datos_y_repo[1]
+
+
+@pytest.fixture
+def datos(datos_y_repo):
+    return datos_y_repo[0]
+
+
+# ============================================
+# USUARIOS
+# ============================================
+
+
+def test_usuario_por_email(repo, correr):
+    assert correr(repo.obtener_usuario_por_email("admin@ejemplo.com")) == (
+        1,
+        "admin@ejemplo.com",
+        "password",
+    )
+    assert correr(repo.obtener_usuario_por_email("nadie@ejemplo.com")) is None
+
+
+def test_roles_usuario(repo, correr):
+    assert sorted(correr(repo.listar_roles_usuario(DIRECTOR))) == [
+        "Director Regional",
+        "Subdirector Centro",
+    ]
+    assert correr(repo.listar_roles_usuario(SUBDIRECTOR)) == ["Subdirector Centro"]
+    assert correr(repo.listar_roles_usuario(9999)) == []
+
+
+def test_directores_subdirectores(repo, correr):
+    directores = correr(repo.listar_directores_subdirectores())
+    # 5 directores + 5 subdirectores + el rol de centro del director
+    assert len(directores) == 11
+    assert directores == sorted(directores, key=lambda u: (u["rol"], u["email"]))
+    assert {"id", "email", "rol", "regional", "centro"} == set(directores[0])
+
+    # Solo cuenta roles regionales
+    assert correr(repo.contar_directores_subdirectores()) == {"Director Regional": 5}
+
+
+# ============================================
+# ASIGNACIONES Y ACCIONES
+# ============================================
+
+
+def test_asignaciones_solo_del_ciclo_actual(repo, correr):
+    asignaciones = correr(repo.listar_asignaciones_usuario(SUBDIRECTOR))
+    assert [a.id_compromiso for a in asignaciones] == [1, 2, 3]
+    assert not {ID_ANTERIOR, ID_SIGUIENTE} & {a.id for a in asignaciones}
+    assert all(a.estado and a.id_rol == ROL_SUBDIRECTOR for a in asignaciones)
+    assert [a.compromiso.peso_porcentual for a in asignaciones] == [40.0, 40.0, 20.0]
+
+    id_asignacion = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 1))
+    assert id_asignacion == asignaciones[0].id
+    assert correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_DIRECTOR, 1)) is None
+
+
+def test_acciones_disponibles(repo, correr):
+    acciones = correr(repo.listar_acciones_disponibles(ROL_SUBDIRECTOR, 1))
+    assert [a.id for a in acciones] == [101, 102, 103]
+    assert [a.obligatorio for a in acciones] == [True, False, False]
+
+    assert correr(repo.existe_accion(ACCION_OPCIONAL, ROL_SUBDIRECTOR, 1))
+    assert not correr(repo.existe_accion(ACCION_OPCIONAL, ROL_DIRECTOR, 1))
+    assert not correr(repo.existe_accion(ACCION_OPCIONAL, ROL_SUBDIRECTOR, 2))
+    assert not correr(repo.existe_accion(9999, ROL_SUBDIRECTOR, 1))
+
+
+def test_guardar_seleccion_inserta_y_actualiza(repo, correr):
+    id_asignacion = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 1))
+    assert correr(repo.listar_acciones_seleccionadas(SUBDIRECTOR, ROL_SUBDIRECTOR, 1)) == []
+
+    id_opcional, insertado = correr(repo.guardar_seleccion(id_asignacion, ACCION_OPCIONAL, 30))
+    assert insertado
+    assert id_opcional == ID_ANTERIOR + 1
+    assert correr(repo.guardar_seleccion(id_asignacion, ACCION_OPCIONAL, 45)) == (
+        id_opcional,
+        False,
+    )
+    correr(repo.guardar_seleccion(id_asignacion, ACCION_OBLIGATORIA, 15))
+    correr(repo.confirmar())
+
+    seleccionadas = correr(repo.listar_acciones_seleccionadas(SUBDIRECTOR, ROL_SUBDIRECTOR, 1))
+    # Obligatorias primero
+    assert [(s.id_accion, s.peso_porcentual_usuario) for s in seleccionadas] == [
+        (ACCION_OBLIGATORIA, 15.0),
+        (ACCION_OPCIONAL, 45.0),
+    ]
+    assert seleccionadas[1].id == id_opcional
+    assert seleccionadas[0].accion.obligatorio
+
+
+# ============================================
+# INNOVACIONES
+# ============================================
+
+
+def test_innovaciones(repo, correr):
+    id_asignacion = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 3))
+    assert correr(repo.contar_innovaciones(id_asignacion)) == 0
+
+    primera = correr(
+        repo.crear_innovacion(
+            id_asignacion,
+            AccionInnovacionRequest(nombre="Primera", peso_porcentual_usuario=60),
+        )
+    )
+    segunda = correr(
+        repo.crear_innovacion(
+            id_asignacion,
+            AccionInnovacionRequest(
+                nombre="Segunda", descripcion="d", peso_porcentual_usuario=40, evidencias="e"
+            ),
+        )
+    )
+    correr(repo.confirmar())
+
+    assert (segunda.nombre, segunda.descripcion, segunda.evidencias) == ("Segunda", "d", "e")
+    assert segunda.peso_porcentual_usuario == 40.0 and segunda.estado
+    assert correr(repo.contar_innovaciones(id_asignacion)) == 2
+    # La más reciente primero
+    assert [i.id for i in correr(repo.listar_innovaciones(SUBDIRECTOR, ROL_SUBDIRECTOR))] == [
+        segunda.id,
+        primera.id,
+    ]
+    assert correr(repo.listar_innovaciones(DIRECTOR, ROL_DIRECTOR)) == []
+
+
+# ============================================
+# VALIDACIÓN Y RESUMEN
+# ============================================
+
+
+def _cargar_pesos(repo, correr):
+    asignacion_1 = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 1))
+    asignacion_2 = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 2))
+    asignacion_3 = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 3))
+    correr(
+        repo.guardar_selecciones(
+            [
+                (asignacion_1, ACCION_OBLIGATORIA, 60),
+                (asignacion_1, ACCION_OPCIONAL, 40),
+                (asignacion_2, ACCION_COMPROMISO_2, 30),
+            ]
+        )
+    )
+    correr(
+        repo.crear_innovacion(
+            asignacion_3, AccionInnovacionRequest(nombre="Innovación", peso_porcentual_usuario=100)
+        )
+    )
+    correr(repo.confirmar())
+
+
+def test_validar_pesos(repo, correr):
+    _cargar_pesos(repo, correr)
+
+    validaciones = correr(repo.validar_pesos(SUBDIRECTOR, ROL_SUBDIRECTOR))
+    # La selección del ciclo anterior no suma
+    assert [
+        (v.compromiso_id, v.total_acciones, v.suma_pesos, v.es_valido) for v in validaciones
+    ] == [(1, 2, 100.0, True), (2, 1, 30.0, False), (3, 1, 100.0, True)]
+    assert [v.peso_real_en_total for v in validaciones] == [40.0, 12.0, 20.0]
+
+    sin_acciones = correr(repo.validar_pesos(DIRECTOR, ROL_DIRECTOR))
+    assert [(v.compromiso_id, v.total_acciones, v.suma_pesos) for v in sin_acciones] == [
+        (1, 0, 0.0),
+        (2, 0, 0.0),
+        (3, 0, 0.0),
+    ]
+    assert correr(repo.validar_pesos(SUBDIRECTOR, ROL_DIRECTOR)) == []
+
+
+def test_resumen_usuario(repo, datos, correr):
+    _cargar_pesos(repo, correr)
+
+    resumen = correr(repo.obtener_resumen_usuario(SUBDIRECTOR))
+    assert (resumen.id, resumen.email, resumen.rol) == (
+        SUBDIRECTOR,
+        f"usuario{SUBDIRECTOR}@ejemplo.com",
+        "Subdirector Centro",
+    )
+    assert resumen.regional is None
+    assert [(c.id, c.suma_pesos, c.estado_completo) for c in resumen.compromisos] == [
+        (1, 100.0, True),
+        (2, 30.0, False),
+        (3, 100.0, True),
+    ]
+    acciones = sorted(
+        (a.nombre, a.peso_porcentual_usuario) for a in resumen.compromisos[0].acciones_seleccionadas
+    )
+    assert acciones == [
+        ("Acción 1 del compromiso 1", 60.0),
+        ("Acción 2 del compromiso 1", 40.0),
+    ]
+
+    assert correr(repo.obtener_resumen_usuario(9999)) is None
+
+
+def test_resumen_elige_el_mismo_rol(repo, datos, correr):
+    """Con varios roles, el de menor id (y su regional y centro)"""
+    id_regional = next(
+        urr["id_regional"]
+        for urr in datos["usuario_rol_regional"]
+        if urr["id_usuario"] == DIRECTOR
+    )
+    resumen = correr(repo.obtener_resumen_usuario(DIRECTOR))
+    assert (resumen.rol, resumen.regional, resumen.centro) == (
+        "Director Regional",
+        f"Regional {id_regional}",
+        "Centro 5",
+    )
+    assert [c.suma_pesos for c in resumen.compromisos] == [0.0, 0.0, 0.0]
+
+
+def test_cumplimiento_por_grupo(repo, datos, correr):
+    _cargar_pesos(repo, correr)
+    # El subdirector completa el compromiso 2 (30 + 70): queda con todo al 100%
+    asignacion_2 = correr(repo.obtener_asignacion(SUBDIRECTOR, ROL_SUBDIRECTOR, 2))
+    correr(repo.guardar_seleccion(asignacion_2, ACCION_COMPROMISO_2 + 1, 70))
+    correr(repo.confirmar())
+
+    ciclo = _ciclo_abierto(datos)
+    asignaciones = [
+        a for a in datos["usuario_compromiso_asignacion"] if a["ciclo"] == ciclo and a["estado"]
+    ]
+    subdirector = next(a for a in asignaciones if a["id_usuario"] == SUBDIRECTOR)
+    por_regional = {}
+    for a in {(a["id_usuario"], a["id_rol"], a["id_regional"]) for a in asignaciones}:
+        conteo = por_regional.setdefault(a[2], [0, 0])
+        conteo[a[1] - 1] += 1
+
+    regionales = correr(repo.cumplimiento_por_grupo("regional", None, None))
+    assert {g.id: [g.total_directores, g.total_subdirectores] for g in regionales} == por_regional
+    assert [g.nombre for g in regionales] == sorted(g.nombre for g in regionales)
+    assert [(g.id, g.subdirectores_completos, g.completos) for g in regionales if g.completos] == [
+        (subdirector["id_regional"], 1, 1)
+    ]
+
+    centros = correr(repo.cumplimiento_por_grupo("centro", subdirector["id_regional"], None))
+    centro = next(g for g in centros if g.id == subdirector["id_centro"])
+    assert (centro.nombre, centro.completos) == (f"Centro {subdirector['id_centro']}", 1)
+    # Los directores no tienen centro: su grupo (sin id ni nombre) va al final
+    director = next(a for a in asignaciones if a["id_usuario"] == DIRECTOR)
+    centros = correr(repo.cumplimiento_por_grupo("centro", director["id_regional"], None))
+    assert (centros[-1].id, centros[-1].nombre) == (None, None)
+    assert centros[-1].total_directores == por_regional[director["id_regional"]][0]
+
+    usuarios = correr(repo.cumplimiento_por_grupo("usuario", None, subdirector["id_centro"]))
+    assert [(g.id, g.nombre, g.total, g.completos, g.porcentaje_completos) for g in usuarios] == [
+        (SUBDIRECTOR, f"usuario{SUBDIRECTOR}@ejemplo.com", 1, 1, 100.0)
+    ]
+
+
+def test_usuarios_regional(repo, datos, correr):
+    ciclo = _ciclo_abierto(datos)
+    for id_regional in (1, 3, 4):
+        esperados = sorted(
+            {
+                a["id_usuario"]
+                for a in datos["usuario_compromiso_asignacion"]
+                if a["id_regional"] == id_regional and a["estado"] and a["ciclo"] == ciclo
+            }
+        )
+        assert esperados
+        assert correr(repo.listar_usuarios_regional(id_regional)) == esperados
+
+
+# ============================================
+# AUDITORÍA
+# ============================================
+
+
+def test_auditoria_paginada(repo, datos, correr):
+    id_asignacion = datos["auditoria_cambios"][0]["id_usuario_compromiso_asignacion"]
+
+    primera = correr(repo.listar_auditoria(id_asignacion, None, 2))
+    assert [e.id for e in primera.eventos] == [5, 4]
+    assert primera.siguiente == 4
+    assert primera.eventos[0].datos == {"peso_porcentual_usuario": 50}
+    assert (primera.eventos[0].operacion, primera.eventos[0].id_usuario_actor) == (
+        "UPDATE",
+        SUBDIRECTOR,
+    )
+
+    segunda = correr(repo.listar_auditoria(id_asignacion, primera.siguiente, 2))
+    assert ([e.id for e in segunda.eventos], segunda.siguiente) == ([3, 2], 2)
+    ultima = correr(repo.listar_auditoria(id_asignacion, segunda.siguiente, 2))
+    assert ([e.id for e in ultima.eventos], ultima.siguiente) == ([1], None)
+
+    assert correr(repo.listar_auditoria(9999, None, 10)).eventos == []
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import settings
+from database import async_session
+from reportes import TIPOS_REPORTE, validar_parametros
+
+logger = logging.getLogger(__name__)
+
+# Estados: pendiente -> en_ejecucion -> completado | fallido | cancelado
+
+QUERY_TRABAJO = """
+SELECT id, tipo, parametros, estado, error, fecha_creacion, fecha_inicio, fecha_fin
+FROM trabajos_reporte WHERE id = :id
+"""
+
+
+class GestorTrabajos:
+    """Ejecutor de reportes en segundo plano con estado persistente en Postgres.
+
+    Limita la concurrencia con un semáforo y permite cancelar (también desde
+    otro proceso: el latido ve el estado y detiene la tarea). Periódicamente
+    retoma los trabajos pendientes o abandonados por un proceso caído.
+    """
+
+    def __init__(self, max_concurrentes: int, intervalo_latido: float = 15):
+        self.intervalo_latido = intervalo_latido
+        self._semaforo = asyncio.Semaphore(max_concurrentes)
+        self._tareas: Dict[int, asyncio.Task] = {}
+        self._deteniendo = False
+        self._vigilancia: Optional[asyncio.Task] = None
+
+    async def iniciar(self):
+        """Retomar trabajos pendientes o abandonados y seguir vigilándolos"""
+        self._deteniendo = False
+        await self._retomar()
+        self._vigilancia = asyncio.create_task(self._vigilar())
+
+    async def detener(self):
+        """Interrumpir trabajos en curso; quedan pendientes para el próximo inicio"""
+        self._deteniendo = True
+        if self._vigilancia:
+            self._vigilancia.cancel()
+            await asyncio.gather(self._vigilancia, return_exceptions=True)
+            self._vigilancia = None
+        tareas = list(self._tareas.values())
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+    async def _retomar(self):
+        async with async_session() as db:
+            # Sin latido reciente = el proceso que lo ejecutaba ya no existe
+            await db.execute(
+                text("""
+                UPDATE trabajos_reporte SET estado = 'pendiente', fecha_inicio = NULL
+                WHERE estado = 'en_ejecucion'
+                  AND fecha_latido < CURRENT_TIMESTAMP - make_interval(secs => :limite)
+                """),
+                {"limite": self.intervalo_latido * 4},
+            )
+            await db.commit()
+            result = await db.execute(
+                text("SELECT id FROM trabajos_reporte WHERE estado = 'pendiente' ORDER BY id")
+            )
+            pendientes = [row[0] for row in result]
+
+        # Si otro proceso también lo programa, solo uno lo reclama en _ejecutar
+        for trabajo_id in pendientes:
+            if trabajo_id not in self._tareas:
+                self._programar(trabajo_id)
+
+    async def _vigilar(self):
+        # Un proceso caído deja trabajos en ejecución sin latido: se retoman sin
+        # esperar a que alguno reinicie
+        while True:
+            await asyncio.sleep(self.intervalo_latido)
+            try:
+                await self._retomar()
+            except Exception:
+                logger.exception("No se pudieron revisar los trabajos abandonados")
+
+    async def enviar(self, tipo: str, parametros: dict, id_usuario: Optional[int]) -> int:
+        """Registrar un trabajo y programarlo"""
+        if tipo not in TIPOS_REPORTE:
+            raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+        parametros = validar_parametros(tipo, parametros)
+
+        async with async_session() as db:
+            result = await db.execute(
+                text("""
+                INSERT INTO trabajos_reporte (tipo, parametros, id_usuario_solicitante)
+                VALUES (:tipo, CAST(:parametros AS JSONB), :id_usuario)
+                RETURNING id
+                """),
+                {"tipo": tipo, "parametros": json.dumps(parametros), "id_usuario": id_usuario},
+            )
+            trabajo_id = result.scalar()
+            await db.commit()
+
+        self._programar(trabajo_id)
+        return trabajo_id
+
+    async def cancelar(self, trabajo_id: int) -> bool:
+        """Cancelar un trabajo pendiente o en ejecución"""
+        async with async_session() as db:
+            result = await db.execute(
+                text("""
+                UPDATE trabajos_reporte SET estado = 'cancelado', fecha_fin = CURRENT_TIMESTAMP
+                WHERE id = :id AND estado IN ('pendiente', 'en_ejecucion')
+                RETURNING id
+                """),
+                {"id": trabajo_id},
+            )
+            cancelado = result.first() is not None
+            await db.commit()
+
+        tarea = self._tareas.get(trabajo_id)
+        if cancelado and tarea:
+            tarea.cancel()
+        return cancelado
+
+    async def obtener(self, trabajo_id: int) -> Optional[dict]:
+        """Estado del trabajo (sin el resultado) o None si no existe"""
+        async with async_session() as db:
+            row = (await db.execute(text(QUERY_TRABAJO), {"id": trabajo_id})).first()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "tipo": row[1],
+            "parametros": row[2],
+            "estado": row[3],
+            "error": row[4],
+            "fecha_creacion": row[5],
+            "fecha_inicio": row[6],
+            "fecha_fin": row[7],
+        }
+
+    async def obtener_resultado(self, trabajo_id: int) -> Optional[Tuple[str, str, object]]:
+        """(estado, tipo, resultado) o None si no existe"""
+        async with async_session() as db:
+            result = await db.execute(
+                text("SELECT estado, tipo, resultado FROM trabajos_reporte WHERE id = :id"),
+                {"id": trabajo_id},
+            )
+            row = result.first()
+        return tuple(row) if row else None
+
+    def _programar(self, trabajo_id: int):
+        tarea = asyncio.create_task(self._ejecutar(trabajo_id))
+        self._tareas[trabajo_id] = tarea
+        tarea.add_done_callback(lambda _: self._tareas.pop(trabajo_id, None))
+
+    async def _ejecutar(self, trabajo_id: int):
+        async with self._semaforo:
+            async with async_session() as db:
+                # Reclamar el trabajo de forma atómica (otro proceso pudo tomarlo)
+                result = await db.execute(
+                    text("""
+                    UPDATE trabajos_reporte
+                    SET estado = 'en_ejecucion', fecha_inicio = CURRENT_TIMESTAMP,
+                        fecha_latido = CURRENT_TIMESTAMP
+                    WHERE id = :id AND estado = 'pendiente'
+                    RETURNING tipo, parametros
+                    """),
+                    {"id": trabajo_id},
+                )
+                trabajo = result.first()
+                await db.commit()
+                if not trabajo:
+                    return
+
+                latido = asyncio.create_task(self._latir(trabajo_id))
+                try:
+                    resultado = await TIPOS_REPORTE[trabajo[0]](db, trabajo[1])
+                except asyncio.CancelledError:
+                    if self._deteniendo:
+                        await self._finalizar(trabajo_id, "pendiente")
+                    raise
+                except Exception as e:
+                    logger.exception("Trabajo %s falló", trabajo_id)
+                    await db.rollback()
+                    await self._finalizar(trabajo_id, "fallido", error=str(e))
+                else:
+                    await self._finalizar(trabajo_id, "completado", resultado=resultado)
+                finally:
+                    latido.cancel()
+
+    async def _latir(self, trabajo_id: int):
+        while True:
+            await asyncio.sleep(self.intervalo_latido)
+            try:
+                async with async_session() as db:
+                    result = await db.execute(
+                        text("""
+                        UPDATE trabajos_reporte SET fecha_latido = CURRENT_TIMESTAMP
+                        WHERE id = :id AND estado = 'en_ejecucion'
+                        RETURNING id
+                        """),
+                        {"id": trabajo_id},
+                    )
+                    sigue = result.first() is not None
+                    await db.commit()
+            except Exception:
+                logger.exception("No se pudo registrar el latido del trabajo %s", trabajo_id)
+                continue
+
+            if not sigue:
+                # Cancelado (o retomado) desde otro proceso: detener la ejecución local
+                tarea = self._tareas.get(trabajo_id)
+                if tarea:
+                    tarea.cancel()
+                return
+
+    async def _finalizar(self, trabajo_id: int, estado: str, error=None, resultado=None):
+        # Sesión propia: la del trabajo puede haber quedado a medio usar.
+        # Solo se actualiza si sigue en ejecución (pudo ser cancelado mientras tanto).
+        async with async_session() as db:
+            await db.execute(
+                text("""
+                UPDATE trabajos_reporte
+                SET estado = :estado, error = :error,
+                    resultado = CAST(:resultado AS JSONB),
+                    fecha_inicio = CASE WHEN :estado = 'pendiente' THEN NULL ELSE fecha_inicio END,
+                    fecha_fin = CASE WHEN :estado = 'pendiente' THEN NULL ELSE CURRENT_TIMESTAMP END
+                WHERE id = :id AND estado = 'en_ejecucion'
+                """),
+                {
+                    "id": trabajo_id,
+                    "estado": estado,
+                    "error": error,
+                    "resultado": json.dumps(resultado) if resultado is not None else None,
+                },
+            )
+            await db.commit()
+
+
+gestor_trabajos = GestorTrabajos(settings.trabajos_max_concurrentes)
@@ -0,0 +1,100 @@
+import math
+from typing import Optional
+
+from config import settings
+from schemas import CumplimientoGrupoResponse, ValidacionPesosResponse
+
+# Sumas de pesos pre-agregadas por asignación (selecciones + innovaciones).
+# Se unen por separado para no multiplicar filas entre ambas tablas.
+JOIN_SUMAS_POR_ASIGNACION = """
+LEFT JOIN (
+    SELECT id_usuario_compromiso_asignacion, COUNT(*) AS total,
+           SUM(peso_porcentual_usuario) AS suma
+    FROM usuario_compromiso_accion_seleccion
+    GROUP BY id_usuario_compromiso_asignacion
+) s ON s.id_usuario_compromiso_asignacion = uca.id
+LEFT JOIN (
+    SELECT id_usuario_compromiso_asignacion, COUNT(*) AS total,
+           SUM(peso_porcentual_usuario) AS suma
+    FROM usuario_accion_innovacion
+    GROUP BY id_usuario_compromiso_asignacion
+) i ON i.id_usuario_compromiso_asignacion = uca.id
+"""
+
+
+# Mismas sumas calculadas solo para las asignaciones de la consulta: conviene
+# cuando se filtra por usuario (el join agregado recorre las tablas completas).
+JOIN_SUMAS_LATERAL = """
+LEFT JOIN LATERAL (
+    SELECT COUNT(*) AS total, SUM(peso_porcentual_usuario) AS suma
+    FROM usuario_compromiso_accion_seleccion
+    WHERE id_usuario_compromiso_asignacion = uca.id
+) s ON TRUE
+LEFT JOIN LATERAL (
+    SELECT COUNT(*) AS total, SUM(peso_porcentual_usuario) AS suma
+    FROM usuario_accion_innovacion
+    WHERE id_usuario_compromiso_asignacion = uca.id
+) i ON TRUE
+"""
+
+
+def es_suma_valida(suma_pesos: float, tolerancia: Optional[float] = None) -> bool:
+    """Verificar que la suma de pesos sea 100% (con tolerancia para flotantes)"""
+    if tolerancia is None:
+        tolerancia = settings.tolerancia_pesos
+    return math.isclose(suma_pesos, 100, rel_tol=0, abs_tol=tolerancia)
+
+
+def calcular_peso_real(suma_pesos: float, peso_compromiso: float) -> float:
+    """Peso real de las acciones dentro del total: suma × peso_compromiso / 100"""
+    return (suma_pesos * peso_compromiso) / 100
+
+
+def construir_validacion(
+    compromiso_id: int,
+    compromiso_nombre: str,
+    peso_compromiso: float,
+    total_acciones: int,
+    suma_pesos: float,
+) -> ValidacionPesosResponse:
+    """Validación de un compromiso a partir de sus totales"""
+    es_valido = es_suma_valida(suma_pesos)
+    return ValidacionPesosResponse(
+        compromiso_id=compromiso_id,
+        compromiso_nombre=compromiso_nombre,
+        total_acciones=total_acciones,
+        suma_pesos=suma_pesos,
+        peso_real_en_total=calcular_peso_real(suma_pesos, peso_compromiso),
+        es_valido=es_valido,
+        mensaje="✓ Válido"
+        if es_valido
+        else f"✗ Deben sumar 100% (actual: {suma_pesos}%)",
+    )
+
+
+def porcentaje(parte: int, total: int) -> float:
+    return round(parte * 100 / total, 2) if total else 0
+
+
+def construir_grupo_cumplimiento(
+    id_grupo: Optional[int],
+    nombre: Optional[str],
+    total_directores: int,
+    directores_completos: int,
+    total_subdirectores: int,
+    subdirectores_completos: int,
+) -> CumplimientoGrupoResponse:
+    """Grupo del dashboard de cumplimiento a partir de sus conteos por rol"""
+    total = total_directores + total_subdirectores
+    completos = directores_completos + subdirectores_completos
+    return CumplimientoGrupoResponse(
+        id=id_grupo,
+        nombre=nombre,
+        total_directores=total_directores,
+        directores_completos=directores_completos,
+        total_subdirectores=total_subdirectores,
+        subdirectores_completos=subdirectores_completos,
+        total=total,
+        completos=completos,
+        porcentaje_completos=porcentaje(completos, total),
+    )